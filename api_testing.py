@@ -1,16 +1,50 @@
+import asyncio
+import datetime
+import gzip
+import json
+import jwt
 import pytest
-from flask import Flask, jsonify, request
-from flask_mysqldb import MySQL
-from api import app
+import threading
+import time
+from flask import Flask, jsonify, make_response, request
+import benchmark
+from availability import Availability
+from api import app, rate_limiter, response_cache, token_cache
+from asgi import create_asgi_app
+from compression import compress, negotiate
+from db import ConnectionPool, PoolTimeout
+from hashing import PasswordHasher, PoolSaturated, hash_rounds
+from idempotency import IdempotencyStore
+from jobs import JobQueue
+from metrics import Registry
+from rate_limit import ConcurrencyLimiter, MemoryBackend as RateLimitMemoryBackend, RateLimiter
+from read_model import ReadModel
+from response_cache import MemoryBackend
+from search import SearchIndex
+from user_store import UserStore
+from versions import TableVersions
 
 # Fixture to mock database
 @pytest.fixture
 def mock_db(mocker):
-    mock_conn = mocker.patch('flask_mysqldb.MySQL.connection')
+    mock_conn = mocker.patch('db.Database.connection')
     mock_cursor = mocker.MagicMock()
     mock_conn.cursor.return_value = mock_cursor
     return mock_cursor
 
+# Cached responses must not leak between tests
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    response_cache.backend = MemoryBackend()
+    rate_limiter.backend = RateLimitMemoryBackend()
+
+# Token for the protected routes
+def auth_headers(role='admin', **claims):
+    payload = {'user_id': 'tester', 'role': role,
+               'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)}
+    payload.update(claims)
+    return {'x-access-token': jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')}
+
 # General Tests
 def test_index():
     client = app.test_client()
@@ -43,7 +77,7 @@ def test_get_manufacturers(mock_db):
 
 def test_add_manufacturer_missing_fields(mock_db):
     client = app.test_client()
-    response = client.post('/manufacturers', json={})
+    response = client.post('/manufacturers', json={}, headers=auth_headers())
     
     assert response.status_code == 400
     assert b"Missing required fields: manufacturer_ShortName and manufacturer_FullName" in response.data
@@ -54,7 +88,7 @@ def test_add_manufacturer_success(mock_db):
     response = client.post('/manufacturers', json={
         'manufacturer_ShortName': 'Ford',
         'manufacturer_FullName': 'Ford Motor Company'
-    })
+    }, headers=auth_headers())
     
     assert response.status_code == 201
     assert b"Manufacturer added successfully" in response.data
@@ -118,7 +152,7 @@ def test_get_vehicles_empty(mock_db):
     mock_db.fetchall.return_value = []
     
     client = app.test_client()
-    response = client.get('/vehicles')
+    response = client.get('/vehicles', headers=auth_headers())
     
     assert response.status_code == 404
     assert b"No vehicles found" in response.data
@@ -129,7 +163,7 @@ def test_get_vehicles(mock_db):
     ]
     
     client = app.test_client()
-    response = client.get('/vehicles')
+    response = client.get('/vehicles', headers=auth_headers())
     
     assert response.status_code == 200
     assert b"SUV Model" in response.data
@@ -154,3 +188,1269 @@ def test_get_inventory(mock_db):
     
     assert response.status_code == 200
     assert b"New York" in response.data
+
+# User registration and login tests
+@pytest.fixture
+def users(tmp_path, mocker):
+    store = UserStore(str(tmp_path / "users.db"))
+    mocker.patch('api.user_store', store)
+    mocker.patch('api.password_hasher', PasswordHasher(workers=1, rounds=4, use_processes=False))
+    return store
+
+def test_register_and_login(users):
+    client = app.test_client()
+    response = client.post('/register', json={'username': 'alice', 'password': 'secret', 'role': 'admin'})
+    assert response.status_code == 201
+    assert users.get('alice')['role'] == 'admin'
+
+    response = client.post('/login', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 200
+    assert 'token' in response.get_json()
+
+def test_register_duplicate_username(users):
+    client = app.test_client()
+    client.post('/register', json={'username': 'bob', 'password': 'secret', 'role': 'manager'})
+    response = client.post('/register', json={'username': 'bob', 'password': 'other', 'role': 'admin'})
+    assert response.status_code == 400
+    assert b"Username already exists" in response.data
+
+def test_login_invalid_credentials(users):
+    client = app.test_client()
+    client.post('/register', json={'username': 'carol', 'password': 'secret', 'role': 'admin'})
+    response = client.post('/login', json={'username': 'carol', 'password': 'wrong'})
+    assert response.status_code == 401
+    response = client.post('/login', json={'username': 'nobody', 'password': 'secret'})
+    assert response.status_code == 401
+
+def test_user_store_imports_legacy_json(tmp_path):
+    legacy = tmp_path / "users.json"
+    legacy.write_text('{"users": [{"username": "dave", "password": "hash", "role": "admin"}]}')
+    store = UserStore(str(tmp_path / "users.db"))
+    assert store.import_json(str(legacy)) == 1
+    assert store.import_json(str(legacy)) == 0
+    assert store.get('dave')['password'] == 'hash'
+
+def test_login_rehashes_on_cost_change(users, mocker):
+    client = app.test_client()
+    client.post('/register', json={'username': 'erin', 'password': 'secret', 'role': 'admin'})
+    assert hash_rounds(users.get('erin')['password']) == 4
+
+    mocker.patch('api.password_hasher', PasswordHasher(workers=1, rounds=5, use_processes=False))
+    response = client.post('/login', json={'username': 'erin', 'password': 'secret'})
+    assert response.status_code == 200
+    assert hash_rounds(users.get('erin')['password']) == 5
+
+def test_login_pool_saturated(users, mocker):
+    mocker.patch.object(PasswordHasher, 'verify', side_effect=PoolSaturated())
+    users.add('frank', 'hash', 'admin')
+    client = app.test_client()
+    response = client.post('/login', json={'username': 'frank', 'password': 'secret'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+# Rate limiting and admission control tests
+def test_login_rate_limited_by_username(users, mocker):
+    mocker.patch('api.rate_limiter', RateLimiter({'login': {'username': '2/minute'}}))
+    client = app.test_client()
+    client.post('/register', json={'username': 'gina', 'password': 'secret', 'role': 'admin'})
+    verify = mocker.spy(PasswordHasher, 'verify')
+    statuses = [client.post('/login', json={'username': 'gina', 'password': 'guess'}).status_code for _ in range(2)]
+    response = client.post('/login', json={'username': 'GINA', 'password': 'guess'})
+
+    assert statuses == [401, 401]
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert verify.call_count == 2
+    assert client.post('/login', json={'username': 'hank', 'password': 'guess'}).status_code == 401
+
+def test_concurrency_cap_sheds_load(mock_db, mocker):
+    limiter = mocker.patch('api.concurrency_limiter', ConcurrencyLimiter({'list': 1, 'export': 1}))
+    mock_db.fetchall.return_value = [(1, 'New York', 1, 5)]
+    mock_db.fetchmany.side_effect = [[(1, 'New York', 1, 5)], []]
+    client = app.test_client()
+
+    assert limiter.acquire('list')
+    response = client.get('/inventory')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    limiter.release('list')
+    assert client.get('/inventory').status_code == 200
+
+    client.get('/inventory?stream=1').close()
+    assert limiter.in_flight() == {'list': 0, 'export': 0}
+
+def test_idempotent_write_replayed(mock_db):
+    mock_db.rowcount = 1
+    client = app.test_client()
+    headers = dict(auth_headers(), **{'Idempotency-Key': 'add-ford'})
+    body = {'manufacturer_ShortName': 'Ford', 'manufacturer_FullName': 'Ford Motor Company'}
+
+    first = client.post('/manufacturers', json=body, headers=headers)
+    retry = client.post('/manufacturers', json=body, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.data == first.data
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert mock_db.execute.call_count == 1
+
+    other = client.post('/manufacturers', json=dict(body, manufacturer_ShortName='Kia'), headers=headers)
+    assert other.status_code == 422
+
+def test_idempotency_store_reservations():
+    store = IdempotencyStore(ttl=60)
+    assert store.begin('k', 'body')[0] == 'new'
+    assert store.begin('k', 'body')[0] == 'in_progress'
+    store.abandon('k')
+    assert store.begin('k', 'body')[0] == 'new'
+    store.complete('k', 'body', 201, [('Content-Type', 'application/json')], b'{}')
+    assert store.begin('k', 'body') == ('replay', ('done', 'body', 201, [('Content-Type', 'application/json')], b'{}'))
+    assert store.begin('k', 'other')[0] == 'mismatch'
+
+def test_identical_gets_coalesced(mock_db, mocker):
+    import api
+
+    flight = mocker.patch('api.inflight_reads', api.SingleFlight())
+    release = threading.Event()
+    mock_db.fetchall.side_effect = lambda: release.wait(5) and [(1, 'New York', 1, 5)]
+    list_table = api.list_table
+
+    def list_table_with_header(*args):
+        response = make_response(list_table(*args))
+        response.headers['X-Served-By'] = 'leader'
+        return response
+    mocker.patch('api.list_table', list_table_with_header)
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(app.test_client().get('/inventory'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()['shared'] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len({r.data for r in responses}) == 1
+    assert [r.headers['X-Served-By'] for r in responses] == ['leader'] * 4
+    assert [r.mimetype for r in responses] == ['application/json'] * 4
+    assert mock_db.execute.call_count == 1
+    assert flight.stats() == {'leaders': 1, 'shared': 3, 'in_flight': 0}
+
+def test_token_bucket_refills():
+    backend = RateLimitMemoryBackend()
+    assert [backend.take('k', 2, 10.0) for _ in range(2)] == [0.0, 0.0]
+    assert 0 < backend.take('k', 2, 10.0) <= 0.1
+
+def test_password_hasher_timeout_keeps_slot():
+    hasher = PasswordHasher(workers=1, max_queue=0, use_processes=False, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(PoolSaturated):
+        hasher._run(lambda submitted_at: (release.wait(5), 0.0, 0.0))
+    # The timed out operation still holds the only slot
+    with pytest.raises(PoolSaturated):
+        hasher.verify('secret', 'hash')
+    assert (hasher.stats()['timeout_count'], hasher.stats()['rejected_count']) == (1, 1)
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while hasher.stats()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert hasher.stats()['in_flight'] == 0
+    hasher.shutdown()
+
+def test_password_hasher_process_pool():
+    hasher = PasswordHasher(workers=1, rounds=4)
+    try:
+        hashed = hasher.hash('secret')
+        assert hasher.verify('secret', hashed)
+        assert not hasher.verify('wrong', hashed)
+        assert hasher.stats()['verify_count'] == 2
+    finally:
+        hasher.shutdown()
+
+# Token validation tests
+def test_protected_route_requires_token(mock_db):
+    client = app.test_client()
+    response = client.get('/vehicles')
+    assert response.status_code == 401
+    assert b"Token is missing!" in response.data
+
+def test_protected_route_rejects_role(mock_db):
+    client = app.test_client()
+    response = client.get('/vehicles', headers=auth_headers(role='customer'))
+    assert response.status_code == 403
+
+def test_token_cache_hits(mock_db):
+    mock_db.fetchall.return_value = [(1, 1, 'SUV Model', 'Electric vehicle')]
+    headers = auth_headers(jti='token-cache-hits')
+    client = app.test_client()
+    hits = token_cache.hits
+    client.get('/vehicles', headers=headers)
+    client.get('/vehicles', headers=headers)
+    assert token_cache.hits == hits + 1
+
+def test_expired_token_not_served_from_cache(mock_db):
+    headers = auth_headers(exp=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1))
+    client = app.test_client()
+    assert client.get('/vehicles', headers=headers).status_code == 401
+    assert client.get('/vehicles', headers=headers).status_code == 401
+
+def test_logout_revokes_token(mock_db):
+    mock_db.fetchall.return_value = [(1, 1, 'SUV Model', 'Electric vehicle')]
+    headers = auth_headers(jti='logout')
+    client = app.test_client()
+    assert client.get('/vehicles', headers=headers).status_code == 200
+    assert client.post('/logout', headers=headers).status_code == 200
+    assert client.get('/vehicles', headers=headers).status_code == 401
+
+# Pagination, projection and filtering tests
+def test_get_inventory_paginated(mock_db):
+    mock_db.fetchall.return_value = [(1, 'New York', 1, 5), (2, 'New York', 2, 3), (3, 'Boston', 1, 7)]
+    client = app.test_client()
+    response = client.get('/inventory?limit=2&after=0')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [i['inventory_ID'] for i in body['data']] == [1, 2]
+    assert body['next_cursor'] == 2
+    query, params = mock_db.execute.call_args[0]
+    assert "WHERE inventory_ID > %s ORDER BY inventory_ID LIMIT %s" in query
+    assert params == (0, 3)
+
+def test_get_inventory_last_page(mock_db):
+    mock_db.fetchall.return_value = []
+    client = app.test_client()
+    response = client.get('/inventory?limit=2&after=3')
+    assert response.status_code == 200
+    assert response.get_json() == {'data': [], 'next_cursor': None}
+
+def test_get_manufacturers_fields_and_filter(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Toyota')]
+    client = app.test_client()
+    response = client.get('/manufacturers?fields=manufacturer_ShortName&manufacturer_ID=1')
+
+    assert response.status_code == 200
+    assert response.get_json() == [{'manufacturer_ShortName': 'Toyota'}]
+    query, params = mock_db.execute.call_args[0]
+    assert query == "SELECT manufacturer_ID, manufacturer_ShortName FROM Car_Manufacturers WHERE manufacturer_ID = %s"
+    assert params == (1,)
+
+def test_get_inventory_invalid_args(mock_db):
+    client = app.test_client()
+    assert client.get('/inventory?fields=password').status_code == 400
+    assert client.get('/inventory?inventory_Count=5').status_code == 400
+    assert client.get('/inventory?vehicle_ID=abc').status_code == 400
+    assert client.get('/inventory?limit=0').status_code == 400
+
+# Streaming export tests
+def test_get_inventory_ndjson_stream(mock_db):
+    mock_db.fetchmany.side_effect = [[(1, 'New York', 1, 5), (2, 'Boston', 2, 3)], [(3, 'Boston', 1, 7)], []]
+    client = app.test_client()
+    response = client.get('/inventory', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.decode().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[2]) == {'inventory_ID': 3, 'branch_location': 'Boston', 'vehicle_ID': 1, 'inventory_Count': 7}
+    mock_db.fetchall.assert_not_called()
+    mock_db.close.assert_called_once()
+
+def test_get_vehicles_json_stream(mock_db):
+    mock_db.fetchmany.side_effect = [[(1, 'SUV Model'), (2, 'Sedan')], []]
+    client = app.test_client()
+    response = client.get('/vehicles?stream=1&fields=vehicle_Description', headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.get_json() == [{'vehicle_Description': 'SUV Model'}, {'vehicle_Description': 'Sedan'}]
+
+# Serialization tests
+def test_get_inventory_columnar(mock_db):
+    mock_db.fetchall.return_value = [(1, 'New York', 1, 5), (2, 'Boston', 2, 3), (3, 'Boston', 1, 7)]
+    client = app.test_client()
+    response = client.get('/inventory?format=columnar&limit=2')
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'data': {'columns': ['inventory_ID', 'branch_location', 'vehicle_ID', 'inventory_Count'],
+                 'rows': [[1, 'New York', 1, 5], [2, 'Boston', 2, 3]]},
+        'next_cursor': 2,
+    }
+    assert client.get('/inventory?format=xml').status_code == 400
+
+def test_serializer_fallback_matches_fast_path(mocker):
+    import serializer
+    rows = [(1, 'Caf\u00e9 "A"', None, 2.5), (2, 'B', 3, 0.0)]
+    columns = ('inventory_ID', 'branch_location', 'vehicle_ID', 'inventory_Count')
+    expected = json.dumps([dict(zip(columns, row)) for row in rows], separators=(',', ':'),
+                          sort_keys=True, ensure_ascii=False).encode()
+    assert serializer.encode_objects(rows, columns) == expected
+
+    mocker.patch.object(serializer, 'orjson', None)
+    mocker.patch.object(serializer, 'ujson', None)
+    assert serializer.encode_objects(rows, columns) == expected
+    assert serializer.encode_object_lines(rows, columns, ('vehicle_ID',)) == b'{"vehicle_ID":null}\n{"vehicle_ID":3}\n'
+
+# Response cache tests
+def test_get_manufacturers_served_from_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Toyota', 'Toyota Motor Corporation', 'Automobile manufacturer')]
+    client = app.test_client()
+    first = client.get('/manufacturers')
+    second = client.get('/manufacturers')
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert mock_db.execute.call_count == 1
+
+def test_get_branches_not_modified(mock_db):
+    mock_db.fetchall.return_value = [('New York', 'Downtown branch', '123')]
+    client = app.test_client()
+    etag = client.get('/branches').headers['ETag']
+    response = client.get('/branches', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+def test_manufacturer_write_invalidates_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Toyota', 'Toyota Motor Corporation', 'Automobile manufacturer')]
+    mock_db.rowcount = 1
+    client = app.test_client()
+    client.get('/manufacturers')
+    client.delete('/manufacturers/1')
+
+    mock_db.fetchall.return_value = [(2, 'Honda', 'Honda Motor Co., Ltd.', 'Automobile manufacturer')]
+    response = client.get('/manufacturers')
+    assert b"Honda" in response.data
+    assert b"Toyota" not in response.data
+
+def test_write_to_missing_row_keeps_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Toyota', 'Toyota Motor Corporation', 'Automobile manufacturer')]
+    client = app.test_client()
+    etag = client.get('/inventory').headers['ETag']
+    client.get('/manufacturers')
+
+    mock_db.rowcount = 0
+    assert client.delete('/manufacturers/999').status_code == 404
+    assert client.put('/inventory/999', json={'inventory_Count': 1}, headers=auth_headers()).status_code == 404
+    mock_db.fetchall.return_value = []
+    assert b"Toyota" in client.get('/manufacturers').data
+    assert client.get('/inventory', headers={'If-None-Match': etag}).status_code == 304
+
+# Conditional GET and compression tests
+def test_get_inventory_not_modified_until_write(mock_db):
+    mock_db.fetchall.return_value = [(1, 'New York', 1, 5)]
+    mock_db.rowcount = 1
+    client = app.test_client()
+    first = client.get('/inventory')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+
+    assert client.get('/inventory', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/inventory', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert mock_db.execute.call_count == 1
+
+    client.patch('/inventory/1', json={'delta': 1}, headers=auth_headers())
+    response = client.get('/inventory', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_table_versions_last_modified_advances():
+    versions = TableVersions(ttl=0)
+    _, before = versions.current('inventory')
+    versions.bump('inventory')
+    versions.bump('inventory')
+    version, after = versions.current('inventory')
+    assert version == '2'
+    assert after >= before + 2
+
+def test_get_inventory_gzip(mock_db):
+    mock_db.fetchall.return_value = [(i, 'New York', 1, i) for i in range(1, 200)]
+    client = app.test_client()
+    plain = client.get('/inventory')
+    response = client.get('/inventory', headers={'Accept-Encoding': 'br;q=0, gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'].startswith('W/')
+    assert gzip.decompress(response.data) == plain.data
+    assert len(response.data) < len(plain.data)
+    assert 'Content-Encoding' not in client.get('/', headers={'Accept-Encoding': 'identity'}).headers
+
+def test_compression_levels_per_encoding(restore_app, tmp_path):
+    import api
+    body = b'{"inventory_Count":1}' * 200
+    assert compress(body, 'gzip', 19) == compress(body, 'gzip', 9)
+    assert compress(body, 'gzip', -3) == compress(body, 'gzip', 0)
+
+    flask_app = api.create_app({'USER_STORE_PATH': str(tmp_path / 'users.db'), 'COMPRESSION_LEVELS': {'zstd': 19}})
+    assert flask_app.config['COMPRESSION_LEVELS'] == {'zstd': 19}
+
+def test_get_inventory_msgpack(mock_db):
+    msgpack = pytest.importorskip('msgpack')
+    mock_db.fetchall.return_value = [(i, 'New York', 1, i) for i in range(1, 200)]
+    client = app.test_client()
+    plain = client.get('/inventory', headers={'Accept': '*/*'})
+    packed = client.get('/inventory', headers={'Accept': 'application/msgpack'})
+    columnar = client.get('/inventory?format=columnar', headers={'Accept': 'application/msgpack'})
+
+    assert plain.mimetype == 'application/json'
+    assert packed.mimetype == 'application/msgpack'
+    assert 'Accept' in packed.headers['Vary']
+    assert packed.headers['ETag'] != plain.headers['ETag']
+    assert msgpack.unpackb(packed.data) == plain.get_json()
+    assert msgpack.unpackb(columnar.data)['rows'][0] == [1, 'New York', 1, 1]
+    assert len(columnar.data) < len(packed.data) < len(plain.data)
+
+def test_binary_formats_for_cached_and_write_responses(mock_db):
+    cbor2 = pytest.importorskip('cbor2')
+    mock_db.fetchall.return_value = [(1, 'Toyota', 'Toyota Motor Corporation', None)]
+    mock_db.rowcount = 0
+    client = app.test_client()
+    headers = {'Accept': 'application/cbor, application/json;q=0.5'}
+
+    assert client.get('/manufacturers').get_json()[0]['manufacturer_ShortName'] == 'Toyota'
+    response = client.get('/manufacturers', headers=headers)
+    assert response.mimetype == 'application/cbor'
+    assert cbor2.loads(response.data)[0]['manufacturer_ShortName'] == 'Toyota'
+    assert mock_db.execute.call_count == 2
+
+    response = client.delete('/manufacturers/9', headers=headers)
+    assert response.status_code == 404
+    assert cbor2.loads(response.data) == {'error': 'Manufacturer with ID 9 not found'}
+
+def test_negotiate_encoding():
+    assert negotiate('gzip, deflate, br', ('zstd', 'br', 'gzip')) == 'br'
+    assert negotiate('gzip;q=0.5, *;q=0.1', ('zstd', 'gzip')) == 'gzip'
+    assert negotiate('*', ('zstd', 'gzip')) == 'zstd'
+    assert negotiate('gzip;q=0', ('gzip',)) is None
+    assert negotiate(None, ('gzip',)) is None
+
+# Connection pool tests
+def test_connection_pool_reuses_connections(mocker):
+    connect = mocker.MagicMock(side_effect=lambda: mocker.MagicMock())
+    pool = ConnectionPool(connect, size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert connect.call_count == 1
+    assert pool.stats()['idle'] == 1
+
+def test_connection_pool_timeout(mocker):
+    pool = ConnectionPool(mocker.MagicMock, size=1, timeout=0.01)
+    pooled = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(pooled)
+    assert pool.stats()['timeouts'] == 1
+
+def test_connection_pool_replaces_dead_connection(mocker):
+    dead = mocker.MagicMock()
+    dead.ping.side_effect = Exception("gone away")
+    connect = mocker.MagicMock(side_effect=[dead, mocker.MagicMock()])
+    pool = ConnectionPool(connect, size=1, ping_interval=0)
+    pool.release(pool.acquire())
+    pooled = pool.acquire()
+    assert pooled.conn is not dead
+    assert pool.stats()['ping_failures'] == 1
+
+# Batch endpoint tests
+def test_update_inventory_batch(mock_db):
+    mock_db.fetchall.return_value = [(1,), (2,)]
+    client = app.test_client()
+    response = client.put('/inventory/batch', json=[
+        {'inventory_ID': 1, 'inventory_Count': 4},
+        {'inventory_ID': 2, 'inventory_Count': 0},
+        {'inventory_ID': 3, 'inventory_Count': 9},
+        {'inventory_ID': 4},
+    ], headers=auth_headers())
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert [r['status'] for r in body['results']] == ['updated', 'updated', 'not_found', 'error']
+    assert body['succeeded'] == 2
+    query, params = mock_db.executemany.call_args[0]
+    assert "UPDATE Inventory" in query
+    assert params == [(4, 1), (0, 2)]
+
+def test_add_manufacturers_batch(mock_db, mocker):
+    import api
+    log_changes = mocker.patch('api.log_changes')
+    items = [
+        {'manufacturer_ShortName': 'Ford', 'manufacturer_FullName': 'Ford Motor Company'},
+        {'manufacturer_ShortName': 'Kia', 'manufacturer_FullName': 'Kia Corporation'},
+    ]
+    client = app.test_client()
+
+    # innodb_autoinc_lock_mode=1, auto_increment_increment=2: one INSERT, ids 7 and 9
+    mocker.patch.object(api.db, '_insert_id_step', None)
+    mock_db.fetchone.return_value = (1, 2)
+    mock_db.lastrowid = 7
+    response = client.post('/manufacturers/batch', json=items, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.get_json()['succeeded'] == 2
+    query, params = mock_db.execute.call_args[0]
+    assert query.count("(%s, %s, %s)") == 2
+    assert params == ['Ford', 'Ford Motor Company', None, 'Kia', 'Kia Corporation', None]
+    log_changes.assert_called_once_with('manufacturers', 'insert', [7, 9])
+
+    # Mode 2 may interleave ids: one INSERT per row
+    mocker.patch.object(api.db, '_insert_id_step', None)
+    mock_db.fetchone.return_value = (2, 1)
+    mock_db.execute.reset_mock()
+    client.post('/manufacturers/batch', json=items, headers=auth_headers())
+    inserts = [c.args[1] for c in mock_db.execute.call_args_list if "INSERT INTO Car_Manufacturers" in c.args[0]]
+    assert inserts == [('Ford', 'Ford Motor Company', None), ('Kia', 'Kia Corporation', None)]
+
+def test_failed_or_empty_batch_keeps_cache(mock_db, mocker):
+    import api
+    mocker.patch.object(api.db, '_insert_id_step', 1)
+    mock_db.fetchall.return_value = [(1, 'Toyota', 'Toyota Motor Corporation', 'Automobile manufacturer')]
+    client = app.test_client()
+    client.get('/manufacturers')
+    bump = mocker.spy(api.table_versions, 'bump')
+
+    assert client.post('/manufacturers/batch', json=[{'manufacturer_ShortName': 'Kia'}],
+                       headers=auth_headers()).status_code == 207
+    mock_db.execute.side_effect = Exception("Deadlock found")
+    assert client.post('/manufacturers/batch', json=[
+        {'manufacturer_ShortName': 'Kia', 'manufacturer_FullName': 'Kia Corporation'},
+    ], headers=auth_headers()).status_code == 500
+    mock_db.execute.side_effect = None
+    assert bump.call_count == 0
+    mock_db.fetchall.return_value = []
+    assert b"Toyota" in client.get('/manufacturers').data
+
+def test_batch_size_limit(mock_db, mocker):
+    mocker.patch.dict(app.config, {'BATCH_MAX_SIZE': 2})
+    client = app.test_client()
+    response = client.delete('/inventory/batch', json=[{'inventory_ID': i} for i in range(3)], headers=auth_headers())
+    assert response.status_code == 413
+    assert client.delete('/inventory/batch', json={}, headers=auth_headers()).status_code == 400
+
+# Atomic inventory adjustment tests
+def test_adjust_inventory(mock_db):
+    mock_db.rowcount = 1
+    mock_db.lastrowid = 4
+    client = app.test_client()
+    response = client.patch('/inventory/1', json={'delta': -1}, headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.get_json() == {'inventory_ID': 1, 'inventory_Count': 4}
+    query, params = mock_db.execute.call_args[0]
+    assert "inventory_Count = LAST_INSERT_ID(inventory_Count + %s)" in query
+    assert "inventory_Count + %s >= 0" in query
+    assert params == [-1, 1, -1]
+
+def test_adjust_inventory_below_zero(change_log):
+    client = app.test_client()
+    response = client.patch('/inventory/1', json={'delta': -8, 'allow_negative': True}, headers=auth_headers())
+    assert response.status_code == 200
+    assert response.get_json() == {'inventory_ID': 1, 'inventory_Count': -3}
+    response = client.patch('/inventory/2', json={'delta': -8}, headers=auth_headers())
+    assert response.status_code == 409
+
+def test_adjust_inventory_insufficient_stock(mock_db):
+    mock_db.rowcount = 0
+    mock_db.fetchone.return_value = (1,)
+    client = app.test_client()
+    response = client.patch('/inventory/1', json={'delta': -10}, headers=auth_headers())
+    assert response.status_code == 409
+
+    mock_db.fetchone.return_value = None
+    response = client.patch('/inventory/999', json={'delta': -1}, headers=auth_headers())
+    assert response.status_code == 404
+
+def test_adjust_inventory_invalid_delta(mock_db):
+    client = app.test_client()
+    assert client.patch('/inventory/1', json={'delta': 0}, headers=auth_headers()).status_code == 400
+    assert client.patch('/inventory/1', json={'delta': '1'}, headers=auth_headers()).status_code == 400
+
+def test_adjust_inventory_batch(mock_db):
+    mock_db.rowcount = 1
+    mock_db.lastrowid = 2
+    client = app.test_client()
+    response = client.patch('/inventory/batch', json=[
+        {'inventory_ID': 1, 'delta': -1},
+        {'inventory_ID': 2, 'delta': 0},
+    ], headers=auth_headers())
+
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert results[0] == {'index': 0, 'status': 'updated', 'inventory_Count': 2}
+    assert results[1]['status'] == 'error'
+    mock_db.executemany.assert_not_called()
+
+# Inventory summary tests
+def test_inventory_summary_by_manufacturer(mock_db):
+    mock_db.fetchall.return_value = [(1, 2, 8), (2, 1, 3)]
+    client = app.test_client()
+    response = client.get('/inventory/summary?group_by=manufacturer_ID')
+
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {'manufacturer_ID': 1, 'items': 2, 'total_count': 8},
+        {'manufacturer_ID': 2, 'items': 1, 'total_count': 3},
+    ]
+    query = mock_db.execute.call_args[0][0]
+    assert "JOIN Vehicles v" in query
+    assert "GROUP BY v.manufacturer_ID" in query
+
+def test_inventory_summary_invalid_group(mock_db):
+    client = app.test_client()
+    response = client.get('/inventory/summary?group_by=inventory_Count')
+    assert response.status_code == 400
+
+def test_inventory_summary_materialized(mock_db, mocker):
+    mocker.patch.dict(app.config, {'INVENTORY_SUMMARY_MATERIALIZED': True})
+    mock_db.fetchall.return_value = [('10', 1, 4), ('9', 2, 6)]
+    client = app.test_client()
+    response = client.get('/inventory/summary?group_by=vehicle_ID')
+
+    assert [r['vehicle_ID'] for r in response.get_json()] == [9, 10]
+    assert "FROM Inventory_Summary" in mock_db.execute.call_args[0][0]
+
+def test_delete_inventory_refreshes_materialized_summary(mock_db, mocker):
+    mocker.patch.dict(app.config, {'INVENTORY_SUMMARY_MATERIALIZED': True})
+    mock_db.fetchall.return_value = [('New York', 1, 2)]
+    mock_db.rowcount = 1
+    client = app.test_client()
+    response = client.delete('/inventory/1', headers=auth_headers())
+
+    assert response.status_code == 200
+    queries = [c[0][0] for c in mock_db.execute.call_args_list]
+    assert sum("INSERT INTO Inventory_Summary" in q for q in queries) == 3
+    assert queries.index(next(q for q in queries if q.startswith("DELETE FROM Inventory "))) < \
+        queries.index(next(q for q in queries if "INSERT INTO Inventory_Summary" in q))
+
+def test_materialized_summary_created_at_startup_and_cascades(restore_app, tmp_path):
+    import api
+    import sqlite_standin
+    path = str(tmp_path / 'car_dealership.sqlite')
+    sqlite_standin.create_schema(path)
+    conn = sqlite_standin.connect(path)
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO Vehicles (manufacturer_ID, vehicle_Description) VALUES (%s, %s)",
+                       [(1, 'SUV Model'), (2, 'Sedan')])
+    cursor.executemany("INSERT INTO Inventory (branch_location, vehicle_ID, inventory_Count) VALUES (%s, %s, %s)",
+                       [('New York', 1, 5), ('Boston', 1, 3), ('Boston', 2, 4)])
+    # MySQL's ON DELETE CASCADE from Vehicles to Inventory
+    cursor.execute("CREATE TRIGGER vehicles_cascade AFTER DELETE ON Vehicles "
+                   "BEGIN DELETE FROM Inventory WHERE vehicle_ID = OLD.vehicle_ID; END")
+    conn.commit()
+    conn.close()
+
+    new_app = api.create_app({'USER_STORE_PATH': str(tmp_path / 'users.db'), 'INVENTORY_SUMMARY_MATERIALIZED': True},
+                             connect=lambda host, port: sqlite_standin.connect(path))
+    client = new_app.test_client()
+    summary = lambda group_by: client.get(f'/inventory/summary?group_by={group_by}').get_json()
+    assert summary('branch_location') == [{'branch_location': 'Boston', 'items': 2, 'total_count': 7},
+                                          {'branch_location': 'New York', 'items': 1, 'total_count': 5}]
+
+    assert client.delete('/vehicles/1', headers=auth_headers()).status_code == 200
+    assert summary('branch_location') == [{'branch_location': 'Boston', 'items': 1, 'total_count': 4}]
+    assert summary('vehicle_ID') == [{'vehicle_ID': 2, 'items': 1, 'total_count': 4}]
+    assert summary('manufacturer_ID') == [{'manufacturer_ID': 2, 'items': 1, 'total_count': 4}]
+
+# Benchmark harness smoke test: every route against the SQLite stand-in
+def test_benchmark_all_routes_sqlite_standin(restore_app):
+
+    args = benchmark.parse_args([
+        '--requests', '3', '--concurrency', '2', '--bcrypt-rounds', '4', '--quiet',
+        '--manufacturers', '5', '--branches', '3', '--vehicles', '10', '--inventory', '20', '--users', '2',
+    ])
+    report = benchmark.run(args)
+
+    routes = {r['route'] for r in report['results']}
+    assert {'login', 'register', 'list_inventory', 'adjust_inventory', 'delete_branch', 'changes', 'search',
+            'availability'} <= routes
+    assert [r['route'] for r in report['results'] if r['errors']] == []
+    assert all(r['requests'] == 3 for r in report['results'])
+    assert report['meta']['boot_ms']['import'] > 0
+    assert report['meta']['plan_warnings'] == []
+    assert report['meta']['encodings']['jsonify']['bytes'] > report['meta']['encodings']['json_columnar']['bytes']
+
+def test_explain_check_flags_missing_index(tmp_path):
+    import sqlite_standin
+    from queries import check_plans
+
+    path = str(tmp_path / 'plans.sqlite')
+    sqlite_standin.create_schema(path)
+    conn = sqlite_standin.connect(path)
+    assert check_plans(conn.cursor()) == []
+    conn.cursor().execute('DROP INDEX idx_inventory_vehicle')
+    conn.close()
+
+    conn = sqlite_standin.connect(path)
+    warnings = check_plans(conn.cursor())
+    assert 'list_inventory_by_vehicle_ID: full scan of Inventory' in warnings
+    assert 'update_inventory: full scan of Inventory' not in warnings
+    conn.close()
+
+# Background jobs
+def wait_for_job(client, url):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = client.get(url).get_json()
+        if job['status'] in ('succeeded', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job still {job['status']}")
+
+def test_delete_manufacturer_async(mock_db):
+    mock_db.rowcount = 1
+    client = app.test_client()
+    response = client.delete('/manufacturers/1', headers={'Prefer': 'respond-async'})
+
+    assert response.status_code == 202
+    assert response.headers['Location'] == response.get_json()['status_url']
+    job = wait_for_job(client, response.headers['Location'])
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'status_code': 200, 'body': {'message': 'Manufacturer deleted successfully'}}
+    assert client.get('/jobs/unknown').status_code == 404
+
+def test_batch_import_job_reports_progress(change_log, mocker):
+    mocker.patch.dict(app.config, {'BATCH_MAX_SIZE': 2})
+    client = app.test_client()
+    items = [{'branch_location': 'Denver', 'vehicle_ID': 1, 'inventory_Count': n} for n in range(4)] + [{'vehicle_ID': 1}]
+    headers = dict(auth_headers(), Prefer='respond-async')
+
+    assert client.post('/inventory/batch', json=items, headers=auth_headers()).status_code == 413
+    response = client.post('/inventory/batch', json=items, headers=headers)
+    assert response.status_code == 202
+    job = wait_for_job(client, response.headers['Location'])
+
+    assert job['status'] == 'succeeded'
+    assert job['progress'] == {'done': 4, 'total': 4}
+    assert job['result']['status_code'] == 207
+    assert (job['result']['body']['succeeded'], job['result']['body']['failed']) == (4, 1)
+    stock = client.get('/inventory?branch_location=Denver').get_json()
+    assert sorted(row['inventory_Count'] for row in stock) == [0, 1, 2, 3]
+    # Each chunk is one multi-row INSERT; the logged ids are the rows'
+    changes = client.get('/changes?since=0&tables=inventory', headers=auth_headers()).get_json()
+    assert sorted(int(c['key']) for c in changes['changes']) == sorted(row['inventory_ID'] for row in stock)
+
+def test_job_retry_resumes_from_progress():
+    calls = []
+
+    def step(job):
+        calls.append(job.done)
+        job.report(job.done + 1, 3)
+        if job.done < 3:
+            raise RuntimeError('connection lost')
+        return 'done'
+
+    jobs = JobQueue(workers=1, max_attempts=3, backoff=0.01)
+    job_id = jobs.submit('steps', step).id
+    deadline = time.monotonic() + 5
+    while jobs.get(job_id)['status'] not in ('succeeded', 'failed') and time.monotonic() < deadline:
+        time.sleep(0.01)
+    jobs.shutdown()
+
+    job = jobs.get(job_id)
+    assert (job['status'], job['attempts'], job['result']) == ('succeeded', 3, 'done')
+    assert calls == [0, 1, 2]
+    assert jobs.stats()['retried'] == 2
+
+def test_job_queue_shutdown_fails_waiting_retries():
+    def flaky(job):
+        raise RuntimeError('connection lost')
+
+    jobs = JobQueue(workers=1, max_attempts=3, backoff=60)
+    job_id = jobs.submit('flaky', flaky).id
+    deadline = time.monotonic() + 5
+    while jobs.get(job_id)['status'] != 'retrying' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    jobs.shutdown()
+
+    job = jobs.get(job_id)
+    assert (job['status'], job['attempts']) == ('failed', 1)
+    assert job['error'] == 'connection lost (not retried: the job queue shut down)'
+    assert job['finished_at'] is not None
+    assert (jobs.stats()['pending'], jobs.stats()['failed']) == (0, 1)
+
+# Change feed tests (SQLite stand-in, so the log is really written and read back)
+@pytest.fixture
+def change_log(tmp_path, mocker):
+    import api
+    import sqlite_standin
+    path = str(tmp_path / 'car_dealership.sqlite')
+    sqlite_standin.create_schema(path)
+    conn = sqlite_standin.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Vehicles (manufacturer_ID, vehicle_Description) VALUES (1, 'SUV Model')")
+    cursor.executemany("INSERT INTO Inventory (branch_location, vehicle_ID, inventory_Count) VALUES (%s, %s, %s)",
+                       [('New York', 1, 5), ('Boston', 1, 3)])
+    conn.commit()
+    conn.close()
+    mocker.patch.object(api.db, 'pool', ConnectionPool(lambda: sqlite_standin.connect(path)))
+    mocker.patch.object(api.db, '_insert_id_step', None)
+    mocker.patch.dict(app.config, {'CHANGE_LOG_ENABLED': True, 'CHANGES_POLL_INTERVAL': 0.05})
+    return path
+
+def test_changes_since(change_log):
+    client = app.test_client()
+    headers = auth_headers()
+    assert client.get('/changes', headers=headers).get_json() == {'changes': [], 'next_since': 0, 'more': False}
+
+    client.patch('/inventory/1', json={'delta': 2}, headers=headers)
+    client.post('/inventory/batch', json=[{'branch_location': 'Boston', 'vehicle_ID': 1, 'inventory_Count': 1}] * 2,
+                headers=headers)
+    client.delete('/inventory/2', headers=headers)
+    client.put('/inventory/99', json={'inventory_Count': 1}, headers=headers)
+
+    body = client.get('/changes?since=0', headers=headers).get_json()
+    assert [(c['seq'], c['op'], c['key']) for c in body['changes']] == [
+        (1, 'update', 1), (2, 'insert', 3), (3, 'insert', 4), (4, 'delete', 2)]
+    assert body['changes'][0]['row']['inventory_Count'] == 7
+    assert body['changes'][3]['row'] is None
+    assert body['next_since'] == 4
+
+    assert client.get('/changes?since=4&tables=vehicles', headers=headers).get_json()['changes'] == []
+    assert client.get('/changes?since=9', headers=headers).status_code == 410
+    assert client.get('/changes?since=0&tables=users', headers=headers).status_code == 400
+
+def test_changes_long_poll_and_stream(change_log):
+    import threading
+    client = app.test_client()
+    headers = auth_headers()
+
+    writer = threading.Timer(0.1, lambda: app.test_client().patch('/inventory/2', json={'delta': -1}, headers=headers))
+    writer.start()
+    body = client.get('/changes?since=0&wait=5', headers=headers).get_json()
+    writer.join()
+    assert [(c['op'], c['key'], c['row']['inventory_Count']) for c in body['changes']] == [('update', 2, 2)]
+
+    app.config['CHANGES_STREAM_SECONDS'] = 0.2
+    response = client.get('/changes?since=0', headers={**headers, 'Accept': 'text/event-stream'})
+    assert response.mimetype == 'text/event-stream'
+    assert b'id: 1\nevent: change\ndata: {"changed_at"' in response.data
+
+# Search tests
+def test_search_index_ranking_and_updates():
+    index = SearchIndex()
+    index.add_rows('manufacturers', [(1, 'TOY', 'Toyota Motor Corporation'), (2, 'FRD', 'Ford Motor Company')])
+    index.add_rows('vehicles', [(10, 1, 'Toyota Corolla sedan'), (11, 1, 'Toyota Camry'), (12, 2, 'Ford Focus')])
+    tables = ('manufacturers', 'vehicles')
+
+    results, more = index.search('toy', tables, 10)
+    assert [(r['table'], r['key']) for r in results] == [('manufacturers', 1), ('vehicles', 11), ('vehicles', 10)]
+    assert results[0]['row'] == {'manufacturer_ID': 1, 'manufacturer_ShortName': 'TOY',
+                                 'manufacturer_FullName': 'Toyota Motor Corporation'}
+    assert more is False
+    # Every token has to match, each as a prefix
+    assert [r['key'] for r in index.search('toyota co', ('vehicles',), 10)[0]] == [10]
+    assert index.search('motor', ('vehicles',), 10) == ([], False)
+
+    results, more = index.search('toyota', tables, 1, offset=1)
+    assert [r['key'] for r in results] == [11] and more is True
+
+    index.replace('vehicles', [10, 12], [(10, 1, 'Yaris')])
+    assert [r['key'] for r in index.search('toyota', ('vehicles',), 10)[0]] == [11]
+    assert index.search('focus', tables, 10) == ([], False)
+    assert len(index) == 4
+
+def test_search_endpoint(change_log, mocker):
+    import api
+    mocker.patch.object(api.READ_MODELS['search'], 'current', None)
+    client = app.test_client()
+    headers = auth_headers()
+    client.post('/manufacturers', json={'manufacturer_ShortName': 'TOY', 'manufacturer_FullName': 'Toyota'},
+                headers=headers)
+
+    body = client.get('/search?q=su', headers=headers).get_json()
+    assert [(r['table'], r['key']) for r in body['data']] == [('vehicles', 1)]
+    assert body['next_cursor'] is None
+
+    # Writes after the index is loaded are applied to it
+    client.put('/vehicles/1', json={'vehicle_Description': 'Toyota RAV4'}, headers=headers)
+    body = client.get('/search?q=toyota', headers=headers).get_json()
+    assert [(r['table'], r['key']) for r in body['data']] == [('manufacturers', 1), ('vehicles', 1)]
+    assert client.get('/search?q=suv', headers=headers).get_json()['data'] == []
+
+    body = client.get('/search?q=toyota&limit=1', headers=headers).get_json()
+    assert body['next_cursor'] == 1
+    assert client.get('/search?q=toyota&after=1&tables=vehicles', headers=headers).get_json()['data'] == []
+
+    assert client.get('/search?q=%20-', headers=headers).status_code == 400
+    assert client.get('/search?q=a&tables=inventory', headers=headers).status_code == 400
+    assert client.get('/search?q=a').status_code == 401
+
+def test_read_model_fetches_outside_lock():
+    reading = threading.Event()
+    release = threading.Event()
+    fetched = []
+
+    def fetch(resource, op, keys):
+        fetched.append(keys)
+        if keys == [1]:
+            reading.set()
+            release.wait(5)
+        return [(key, op) for key in keys]
+
+    model = ReadModel(['vehicles'], dict, fetch, lambda m, resource, op, keys, rows: m.update(rows))
+    model.get()
+    slow = threading.Thread(target=model.changed, args=('vehicles', 'update', [1]))
+    slow.start()
+    assert reading.wait(5)
+    # Not held up by the slow read
+    model.changed('vehicles', 'insert', [2])
+    assert model.current == {2: 'insert'}
+
+    release.set()
+    slow.join()
+    assert model.current == {1: 'update', 2: 'insert'}
+    # The slow read is repeated, as a patch landed while it ran
+    assert fetched == [[1], [2], [1]]
+
+# Availability read model tests
+def test_availability_lookup_and_updates():
+    availability = Availability()
+    availability.add_rows('manufacturers', [(1, 'TOY', 'Toyota'), (2, 'FRD', 'Ford')])
+    availability.add_rows('vehicles', [(10, 1, 'Corolla'), (11, 1, 'Camry'), (12, 2, 'Focus')])
+    availability.add_rows('branches', [('Boston',), ('New York',)])
+    availability.add_rows('inventory', [(1, 'Boston', 10, 2), (2, 'New York', 10, 3), (3, 'Boston', 10, 1),
+                                        (4, 'Boston', 12, 5), (5, 'New York', 11, 0)])
+
+    rows = availability.lookup(vehicle_ID=10)
+    assert [(r['branch_location'], r['inventory_Count']) for r in rows] == [('Boston', 3), ('New York', 3)]
+    assert rows[0]['manufacturer_ShortName'] == 'TOY' and rows[0]['vehicle_Description'] == 'Corolla'
+    # Out of stock branches are left out
+    assert [r['vehicle_ID'] for r in availability.lookup(manufacturer_ID=1)] == [10, 10]
+    assert availability.lookup(manufacturer_ID=1, branch_location='New York')[0]['inventory_Count'] == 3
+    assert availability.lookup(vehicle_ID=12, manufacturer_ID=1) == []
+
+    availability.replace('inventory', [1, 5], [(5, 'New York', 11, 4)])
+    assert [(r['vehicle_ID'], r['branch_location'], r['inventory_Count']) for r in availability.lookup(manufacturer_ID=1)] == [
+        (10, 'Boston', 1), (10, 'New York', 3), (11, 'New York', 4)]
+    availability.replace('vehicles', [11], [(11, 2, 'Camry')])
+    assert availability.lookup(vehicle_ID=11)[0]['manufacturer_FullName'] == 'Ford'
+    availability.replace('branches', ['Boston'], [])
+    availability.replace_inventory('branch_location', ['Boston'], [])
+    assert availability.lookup(vehicle_ID=12) == []
+    assert len(availability) == 2
+    availability.replace_inventory('vehicle_ID', [10], [])
+    assert availability.lookup(vehicle_ID=10) == []
+    assert len(availability) == 1
+
+def test_availability_endpoint(change_log, mocker):
+    import api
+    import sqlite_standin
+    mocker.patch.object(api.READ_MODELS['availability'], 'current', None)
+    conn = sqlite_standin.connect(change_log)
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO Branches (branch_location) VALUES (%s)", [('New York',), ('Boston',)])
+    cursor.execute("INSERT INTO Car_Manufacturers (manufacturer_ShortName, manufacturer_FullName) VALUES ('TOY', 'Toyota')")
+    conn.commit()
+    conn.close()
+    client = app.test_client()
+    headers = auth_headers()
+
+    body = client.get('/availability?vehicle_ID=1', headers=headers).get_json()
+    assert [(r['branch_location'], r['inventory_Count']) for r in body] == [('Boston', 3), ('New York', 5)]
+    assert body[0]['manufacturer_FullName'] == 'Toyota'
+
+    # Writes are applied to the loaded model
+    client.patch('/inventory/2', json={'delta': 4}, headers=headers)
+    client.post('/inventory/batch', json=[{'branch_location': 'Boston', 'vehicle_ID': 1, 'inventory_Count': 1}],
+                headers=headers)
+    client.delete('/inventory/1', headers=headers)
+    body = client.get('/availability?manufacturer_ID=1', headers=headers).get_json()
+    assert [(r['branch_location'], r['inventory_Count']) for r in body] == [('Boston', 8)]
+    # Only deleting a vehicle or branch reloads its inventory
+    replace_inventory = mocker.spy(Availability, 'replace_inventory')
+    client.put('/vehicles/1', json={'vehicle_Description': 'Corolla'}, headers=headers)
+    assert replace_inventory.call_count == 0
+    client.delete('/vehicles/1', headers=headers)
+    assert replace_inventory.call_count == 1
+    assert client.get('/availability?vehicle_ID=1', headers=headers).get_json() == []
+
+    assert client.get('/availability', headers=headers).status_code == 400
+    assert client.get('/availability?vehicle_ID=x', headers=headers).status_code == 400
+    assert client.get('/availability?vehicle_ID=1').status_code == 401
+
+# Read replica tests: three SQLite stand-ins with different stock, so the
+# count shows which database answered
+@pytest.fixture
+def replicas(tmp_path, mocker):
+    import api
+    import sqlite_standin
+    from db import Replica
+    paths = {}
+    for name, count in (('primary', 5), ('replica-a', 4), ('replica-b', 3)):
+        paths[name] = str(tmp_path / f'{name}.sqlite')
+        sqlite_standin.create_schema(paths[name])
+        conn = sqlite_standin.connect(paths[name])
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO Vehicles (manufacturer_ID, vehicle_Description) VALUES (1, 'SUV Model')")
+        cursor.execute("INSERT INTO Inventory (branch_location, vehicle_ID, inventory_Count) VALUES ('Boston', 1, %s)",
+                       (count,))
+        conn.commit()
+        conn.close()
+
+    lag = {'replica-a': 0, 'replica-b': 0}
+    def measure(name):
+        def lag_of(conn):
+            if isinstance(lag[name], Exception):
+                raise lag[name]
+            return lag[name]
+        return lag_of
+    mocker.patch.object(api.db, 'pool', ConnectionPool(lambda: sqlite_standin.connect(paths['primary'])))
+    mocker.patch.object(api.db, 'replicas', [
+        Replica(name, ConnectionPool(lambda path=paths[name]: sqlite_standin.connect(path)), lag=measure(name))
+        for name in lag
+    ])
+    mocker.patch.object(api, 'table_versions', TableVersions())
+    mocker.patch.dict(app.config, {'REPLICA_CHECK_INTERVAL': 0})
+    return lag
+
+def stock(client, path='/inventory', field='inventory_Count'):
+    return client.get(path).get_json()[0][field]
+
+def test_reads_are_balanced_over_replicas(replicas):
+    client = app.test_client()
+    assert sorted(stock(client) for _ in range(4)) == [3, 3, 4, 4]
+
+    # A lagging or broken replica is skipped; with none left, reads use the primary
+    replicas['replica-a'] = 30
+    assert {stock(client) for _ in range(3)} == {3}
+    replicas['replica-b'] = RuntimeError('replication stopped')
+    assert stock(client) == 5
+
+def test_read_your_writes(replicas):
+    client = app.test_client()
+    summary = '/inventory/summary?group_by=branch_location'
+    response = client.patch('/inventory/1', json={'delta': 1}, headers=auth_headers())
+    assert 'db_primary_until=' in response.headers['Set-Cookie']
+
+    # The writer is kept on the primary; other clients aren't
+    assert stock(client, summary, 'total_count') == 6
+    assert stock(app.test_client(), summary, 'total_count') in (3, 4)
+    # Recently written tables are read from the primary by everyone, so a
+    # stale replica row is never sent under the new version's ETag
+    assert stock(app.test_client()) == 6
+
+# Metrics tests
+def test_metrics_endpoint(mock_db):
+    mock_db.fetchall.return_value = [(1, 'New York', 1, 5)]
+    client = app.test_client()
+    client.get('/inventory')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.data.decode()
+    assert 'http_request_duration_seconds_count{method="GET",route="/inventory",status="200"}' in body
+    assert 'db_query_duration_seconds_count{statement="SELECT",table="Inventory"}' in body
+    assert 'db_rows_total{statement="SELECT",table="Inventory"}' in body
+    assert 'db_pool_connections{state="in_use"}' in body
+
+def test_slow_query_log(mock_db, mocker, caplog):
+    mocker.patch.dict(app.config, {'SLOW_QUERY_MS': 0.000001})
+    mock_db.fetchall.return_value = [(1, 'New York', 1, 5)]
+    client = app.test_client()
+    with caplog.at_level('WARNING', logger='api.slow_queries'):
+        client.get('/inventory?vehicle_ID=1')
+    assert any("FROM Inventory WHERE vehicle_ID = %s" in r.getMessage() for r in caplog.records)
+
+def test_histogram_render():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, '/a')
+    histogram.observe(0.5, '/a')
+    histogram.observe(5, '/a')
+    body = registry.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in body
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in body
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in body
+    assert 'latency_seconds_count{route="/a"} 3' in body
+
+# Async serving mode tests
+class FakeAsyncDatabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetchall(self, query, params):
+        self.queries.append((query, params))
+        return self.rows
+
+    async def stream(self, query, params, batch_size):
+        yield self.rows
+
+def call_asgi(asgi_app, method, path, query_string=b"", headers=(), body=b""):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query_string,
+             "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    asyncio.run(asgi_app(scope, receive, send))
+    response_headers = dict(messages[0]["headers"])
+    return messages[0]["status"], response_headers, b"".join(m.get("body", b"") for m in messages[1:])
+
+def test_asgi_inventory_matches_flask_contract(mock_db):
+    rows = ((1, 'New York', 1, 5), (2, 'Boston', 2, 3))
+    mock_db.fetchall.return_value = rows
+    flask_body = app.test_client().get('/inventory?limit=1').data
+
+    status, _, body = call_asgi(create_asgi_app(FakeAsyncDatabase(rows)), "GET", "/inventory", b"limit=1")
+    assert status == 200
+    assert body == flask_body
+
+def test_asgi_stream_matches_flask_contract(mock_db):
+    rows = ((1, 'New York', 1, 5), (2, 'Boston', 2, 3))
+    for headers in ((), (('Accept', 'application/x-ndjson'),)):
+        mock_db.fetchmany.side_effect = [list(rows), []]
+        flask_response = app.test_client().get('/inventory?stream=1', headers=dict(headers))
+        flask_body = flask_response.data
+        flask_response.close()
+
+        status, asgi_headers, body = call_asgi(create_asgi_app(FakeAsyncDatabase(rows)), "GET", "/inventory",
+                                               b"stream=1", headers)
+        assert status == 200
+        assert body == flask_body
+        assert asgi_headers[b'content-type'].decode() == flask_response.mimetype
+    assert flask_response.mimetype == 'application/x-ndjson'
+
+def test_asgi_vehicles_requires_token():
+    asgi_app = create_asgi_app(FakeAsyncDatabase(((1, 1, 'SUV Model', 'Electric vehicle'),)))
+    status, _, _ = call_asgi(asgi_app, "GET", "/vehicles")
+    assert status == 401
+
+    token = auth_headers()['x-access-token']
+    status, _, body = call_asgi(asgi_app, "GET", "/vehicles", headers=[("x-access-token", token)])
+    assert status == 200
+    assert json.loads(body)[0]['vehicle_Description'] == 'SUV Model'
+
+def test_asgi_register_and_login(restore_app, tmp_path):
+    import api
+    flask_app = api.create_app({'USER_STORE_PATH': str(tmp_path / 'users.db'), 'BCRYPT_ROUNDS': 4,
+                                'BCRYPT_USE_PROCESSES': False})
+    asgi_app = create_asgi_app(FakeAsyncDatabase(()), flask_app=flask_app)
+    credentials = {'username': 'ivy', 'password': 'secret'}
+    status, _, _ = call_asgi(asgi_app, "POST", "/register", body=json.dumps(dict(credentials, role='manager')).encode())
+    assert status == 201
+
+    status, _, body = call_asgi(asgi_app, "POST", "/login", body=json.dumps(credentials).encode())
+    assert status == 200
+    claims = jwt.decode(json.loads(body)['token'], flask_app.config['SECRET_KEY'], algorithms=['HS256'])
+    assert (claims['user_id'], claims['role']) == ('ivy', 'manager')
+    status, _, _ = call_asgi(asgi_app, "POST", "/login", body=json.dumps(dict(credentials, password='wrong')).encode())
+    assert status == 401
+
+def test_asgi_login_rate_limited_by_username(restore_app, tmp_path):
+    import api
+    flask_app = api.create_app({'USER_STORE_PATH': str(tmp_path / 'users.db'), 'BCRYPT_ROUNDS': 4,
+                                'BCRYPT_USE_PROCESSES': False, 'RATE_LIMITS': {'login': {'username': '1/minute'}}})
+    asgi_app = create_asgi_app(FakeAsyncDatabase(()), flask_app=flask_app)
+    login = lambda username: call_asgi(asgi_app, "POST", "/login",
+                                       body=json.dumps({'username': username, 'password': 'guess'}).encode())
+    assert login('jack')[0] == 401
+    status, headers, _ = login('JACK')
+    assert status == 429
+    assert int(headers[b'retry-after']) >= 1
+    assert login('kate')[0] == 401
+
+def test_asgi_list_rate_limited_by_user(restore_app, tmp_path):
+    import api
+    flask_app = api.create_app({'USER_STORE_PATH': str(tmp_path / 'users.db'),
+                                'RATE_LIMITS': {'list': {'user': '1/minute'}}})
+    asgi_app = create_asgi_app(FakeAsyncDatabase(((1, 1, 'SUV Model', 'Electric vehicle'),)), flask_app=flask_app)
+    headers = [("x-access-token", auth_headers()['x-access-token'])]
+    assert call_asgi(asgi_app, "GET", "/vehicles", headers=headers)[0] == 200
+    status, response_headers, _ = call_asgi(asgi_app, "GET", "/vehicles", headers=headers)
+    assert status == 429
+    assert int(response_headers[b'retry-after']) >= 1
+    # Requests without a user are not limited by it
+    assert call_asgi(asgi_app, "GET", "/inventory")[0] == 200
+
+def test_asgi_stream_uses_export_slot(restore_app, tmp_path):
+    import api
+    flask_app = api.create_app({'USER_STORE_PATH': str(tmp_path / 'users.db'),
+                                'CONCURRENCY_LIMITS': {'list': 1, 'export': 1}})
+    asgi_app = create_asgi_app(FakeAsyncDatabase(((1, 'New York', 1, 5),)), flask_app=flask_app)
+    assert api.concurrency_limiter.acquire('export')
+    status, headers, _ = call_asgi(asgi_app, "GET", "/inventory", b"stream=1")
+    assert status == 503
+    assert headers[b'retry-after'] == b'1'
+    assert call_asgi(asgi_app, "GET", "/inventory")[0] == 200
+    api.concurrency_limiter.release('export')
+
+    # A finished stream gives its slot back
+    assert call_asgi(asgi_app, "GET", "/inventory", b"stream=1")[0] == 200
+    assert api.concurrency_limiter.in_flight()['export'] == 0
+
+def test_asgi_empty_table_and_unknown_route():
+    asgi_app = create_asgi_app(FakeAsyncDatabase(()))
+    assert call_asgi(asgi_app, "GET", "/branches")[0] == 404
+    assert call_asgi(asgi_app, "PUT", "/inventory/1")[0] == 404
+
+# App factory and startup tests. create_app() rebuilds the module's
+# components, so these restore the ones the other tests use.
+@pytest.fixture
+def restore_app(mocker):
+    import api
+    for name in ('token_cache', 'rate_limiter', 'concurrency_limiter', 'response_cache', 'table_versions',
+                 'idempotency_store', 'job_queue'):
+        mocker.patch.object(api, name, getattr(api, name))
+    for name in ('app', 'connect', 'on_query', 'on_fetch'):
+        mocker.patch.object(api.db, name, getattr(api.db, name))
+    # create_app() closes these, so it is handed none
+    for name in ('user_store', 'password_hasher'):
+        mocker.patch.object(api, name, None)
+    for name in ('pool', 'replicas'):
+        mocker.patch.object(api.db, name, None)
+
+def test_create_app_overrides(restore_app):
+    import api
+    new_app = api.create_app({'TOKEN_CACHE_SIZE': 5, 'RATE_LIMITS': {'login': {'ip': '1/minute'}},
+                              'IDEMPOTENCY_PENDING_TTL': 120})
+    assert new_app is not app
+    assert new_app.config['TOKEN_CACHE_SIZE'] == 5
+    assert api.idempotency_store.pending_ttl == 120
+    assert new_app.config['MYSQL_PORT'] == 3306
+    # Dict settings are merged with the defaults one level deep
+    assert new_app.config['RATE_LIMITS']['login'] == {'ip': '1/minute', 'username': '10/minute'}
+    assert api.rate_limiter.limits['login']['ip'] == (1, 1 / 60)
+    assert new_app.test_client().get('/').status_code == 200
+
+def test_create_app_config_file_and_env(restore_app, tmp_path, monkeypatch):
+    import api
+    config_file = tmp_path / 'api.json'
+    config_file.write_text(json.dumps({'MYSQL_HOST': 'db.internal', 'MYSQL_PORT': '3307', 'MAX_PAGE_SIZE': 50}))
+    monkeypatch.setenv('API_CONFIG_FILE', str(config_file))
+    monkeypatch.setenv('MAX_PAGE_SIZE', '20')
+    monkeypatch.setenv('COMPRESSION_ENABLED', '0')
+
+    config = api.create_app({'MYSQL_DB': 'test'}).config
+    assert (config['MYSQL_HOST'], config['MYSQL_PORT'], config['MYSQL_DB']) == ('db.internal', 3307, 'test')
+    assert config['MAX_PAGE_SIZE'] == 20
+    assert config['COMPRESSION_ENABLED'] is False
+
+def test_import_defers_heavy_modules():
+    import subprocess
+    import sys
+    code = ("import json, sys, api; "
+            "print(json.dumps([m for m in ('bcrypt', 'jwt', 'MySQLdb') if m in sys.modules]))")
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert json.loads(output) == []
+
+def test_index_conditional_get():
+    client = app.test_client()
+    response = client.get('/')
+    assert response.headers['Cache-Control'] == 'public, max-age=3600'
+    etag = response.headers['ETag']
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
@@ -0,0 +1,376 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import api
+from listing import ListArgsError, build_select, paginate, parse_list_args
+from schema import BRANCHES, INVENTORY, MANUFACTURERS, VEHICLES
+from serializer import LAYOUTS, encode_page, encode_rows
+from streaming import NDJSON_MIMETYPE, encode_batch, stream_format, wants_stream
+
+# Async serving mode for the I/O-bound read routes (GET /, /manufacturers,
+# /branches, /vehicles, /inventory) and the bcrypt-heavy /login and /register,
+# with the same JSON contracts as api.py. Database I/O goes through an
+# aiomysql pool and bcrypt runs on the PasswordHasher pool off the event loop,
+# so one process can hold thousands of concurrent connections:
+#
+#     uvicorn asgi:app --workers 4
+#
+# Write routes are not served here; send them to the threaded app.
+
+def dumps(obj):
+    # Same output as Flask's default JSON provider
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+class AioMySQLDatabase:
+    def __init__(self, config):
+        self.config = config
+        self.pool = None
+
+    async def start(self):
+        import aiomysql
+
+        self.pool = await aiomysql.create_pool(
+            host=self.config["MYSQL_HOST"],
+            port=self.config["MYSQL_PORT"],
+            user=self.config["MYSQL_USER"],
+            password=self.config["MYSQL_PASSWORD"],
+            db=self.config["MYSQL_DB"],
+            charset="utf8mb4",
+            minsize=1,
+            maxsize=self.config["MYSQL_POOL_SIZE"],
+            pool_recycle=self.config["MYSQL_POOL_MAX_LIFETIME"],
+        )
+
+    async def fetchall(self, query, params):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+
+    async def stream(self, query, params, batch_size):
+        import aiomysql
+
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+
+# Runs a blocking MySQLdb-compatible driver (e.g. the SQLite stand-in) on a
+# thread pool; used by the benchmark when no MySQL server is available.
+class ExecutorDatabase:
+    def __init__(self, connect, size=10):
+        from db import ConnectionPool
+
+        self.pool = ConnectionPool(connect, size=size)
+        self._executor = ThreadPoolExecutor(max_workers=size)
+
+    async def start(self):
+        pass
+
+    def _fetchall(self, query, params):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    async def fetchall(self, query, params):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._fetchall, query, params)
+
+    async def stream(self, query, params, batch_size):
+        yield await self.fetchall(query, params)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.remote_addr = (scope.get("client") or (None,))[0]
+        self.args = dict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        # Parsed like Flask's, so streaming.py negotiates the same way
+        self.accept_mimetypes = parse_accept_header(self.headers.get("accept"), MIMEAccept)
+        self.body = body
+        self.current_user = None
+
+    def get_json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type="application/json", headers=None, chunks=None):
+        self.body = body
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.chunks = chunks
+        # Called once the response is sent or the client goes away
+        self.on_close = None
+
+    async def send(self, send):
+        try:
+            await self.send_body(send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+    async def send_body(self, send):
+        headers = [(b"content-type", self.content_type.encode("latin-1"))]
+        headers += [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in self.headers.items()]
+        if self.chunks is None:
+            headers.append((b"content-length", str(len(self.body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": self.status, "headers": headers})
+        if self.chunks is None:
+            await send({"type": "http.response.body", "body": self.body})
+            return
+        async for chunk in self.chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def json_response(obj, status=200, headers=None):
+    return Response(dumps(obj) + b"\n", status, headers=headers)
+
+
+def error_response(error_msg, status_code, headers=None):
+    return json_response({"error": error_msg}, status_code, headers)
+
+
+class AsyncApp:
+    def __init__(self, database=None, config=None, flask_app=None):
+        # The user store, hashing pool and tokens are configured by the Flask app
+        self.flask_app = flask_app or api.app
+        self.config = config or self.flask_app.config
+        self.database = database or AioMySQLDatabase(self.config)
+        self.routes = {
+            ("GET", "/"): self.index,
+            ("GET", "/manufacturers"): self.admission_control(
+                "list", lambda r: self.list_table(r, MANUFACTURERS, "No manufacturers found")
+            ),
+            ("GET", "/branches"): self.admission_control(
+                "list", lambda r: self.list_table(r, BRANCHES, "No branches found")
+            ),
+            ("GET", "/vehicles"): self.admission_control(
+                "list", lambda r: self.list_table(r, VEHICLES, "No vehicles found"), ["admin", "manager"]
+            ),
+            ("GET", "/inventory"): self.admission_control(
+                "list", lambda r: self.list_table(r, INVENTORY, "No inventory found")
+            ),
+            ("POST", "/login"): self.admission_control("login", self.login),
+            ("POST", "/register"): self.admission_control("register", self.register),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        request = Request(scope, body)
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            response = error_response("Not found", 404)
+        else:
+            try:
+                response = await handler(request)
+            except api.PoolSaturated:
+                response = error_response("Server is busy, please retry", 503, {"Retry-After": "1"})
+            except Exception as e:
+                response = error_response(f"An error occurred: {str(e)}", 500)
+        await response.send(send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.database.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.database.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def authorize(self, request, valid_roles):
+        token = request.headers.get("x-access-token")
+        if not token:
+            return error_response("Token is missing!", 401)
+
+        current_user = api.token_cache.get(token)
+        if current_user is None:
+            if api.token_cache.is_revoked(token):
+                return error_response("Token is invalid!", 401)
+            import jwt
+
+            try:
+                data = jwt.decode(token, self.config["SECRET_KEY"], algorithms=["HS256"])
+                current_user = {"user_id": data["user_id"], "role": data["role"]}
+            except Exception:
+                return error_response("Token is invalid!", 401)
+            api.token_cache.put(token, current_user, data.get("exp"))
+
+        if current_user["role"] not in valid_roles:
+            return error_response("Unauthorized access", 403)
+        request.current_user = current_user
+        return None
+
+    def admission_control(self, route_class, handler, valid_roles=None):
+        # The rate limits (by client IP, user and username) and concurrency
+        # caps of api.admission_control(), shared with the threaded app in this
+        # process. Streamed responses keep their slot until the stream ends.
+        async def wrapper(request):
+            if valid_roles is not None:
+                error = self.authorize(request, valid_roles)
+                if error:
+                    return error
+
+            effective_class = "export" if route_class == "list" and wants_stream(request) else route_class
+            if self.config["RATE_LIMIT_ENABLED"]:
+                keys = {"ip": request.remote_addr}
+                if request.current_user:
+                    keys["user"] = request.current_user["user_id"]
+                data = request.get_json()
+                if isinstance(data, dict) and isinstance(data.get("username"), str):
+                    keys["username"] = data["username"].lower()
+                limited = await self.run_blocking(api.rate_limiter.check, effective_class, keys)
+                if limited:
+                    key_type, retry_after = limited
+                    api.rate_limited.inc(effective_class, key_type)
+                    return error_response("Too many requests, please retry later", 429, {"Retry-After": str(retry_after)})
+
+            if not await self.run_blocking(api.concurrency_limiter.acquire, effective_class):
+                api.admission_rejected.inc(effective_class)
+                return error_response("Server is busy, please retry", 503, {"Retry-After": "1"})
+            try:
+                response = await handler(request)
+            except Exception:
+                api.concurrency_limiter.release(effective_class)
+                raise
+            if response.chunks is None:
+                api.concurrency_limiter.release(effective_class)
+            else:
+                response.on_close = lambda: api.concurrency_limiter.release(effective_class)
+            return response
+        return wrapper
+
+    def accounts(self):
+        with self.flask_app.app_context():
+            return api.get_user_store(), api.get_password_hasher()
+
+    def create_token(self, username, role):
+        with self.flask_app.app_context():
+            return api.create_token(username, role)
+
+    async def run_blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def index(self, request):
+        return Response(api.INDEX_PAGE, content_type="text/html; charset=utf-8")
+
+    async def list_table(self, request, table, not_found_msg):
+        try:
+            fields, filters, limit, after = parse_list_args(table, request.args, self.config["MAX_PAGE_SIZE"])
+        except ListArgsError as e:
+            return error_response(str(e), 400)
+
+        layout = request.args.get("format", "objects")
+        if layout not in LAYOUTS:
+            return error_response(f"format must be one of: {', '.join(LAYOUTS)}", 400)
+
+        query, params, columns = build_select(table, fields, filters, limit, after)
+
+        if wants_stream(request):
+            fmt = stream_format(request)
+            return Response(
+                content_type=NDJSON_MIMETYPE if fmt == "ndjson" else "application/json",
+                chunks=self.stream_rows(query, params, columns, fields, fmt),
+            )
+
+        rows = await self.database.fetchall(query, params)
+        if limit is None and after is None:
+            if not rows:
+                return error_response(not_found_msg, 404)
+            return Response(encode_rows(rows, columns, fields, layout) + b"\n")
+
+        rows, next_cursor = paginate(list(rows), columns, limit, table.key)
+        return Response(encode_page(encode_rows(rows, columns, fields, layout), next_cursor) + b"\n")
+
+    async def stream_rows(self, query, params, columns, fields, fmt):
+        first = True
+        if fmt == "json":
+            yield b"["
+        async for rows in self.database.stream(query, params, self.config["STREAM_BATCH_SIZE"]):
+            if rows:
+                yield encode_batch(rows, columns, fields, fmt, first)
+                first = False
+        if fmt == "json":
+            yield b"]"
+
+    async def register(self, request):
+        data = request.get_json()
+        if not data or not data.get("username") or not data.get("password") or not data.get("role"):
+            return error_response("Missing required fields: username, password, and role are mandatory", 400)
+
+        store, hasher = self.accounts()
+        if data["username"] in store:
+            return error_response("Username already exists", 400)
+
+        password = await self.run_blocking(hasher.hash, data["password"])
+        if not await self.run_blocking(store.add, data["username"], password, data["role"]):
+            return error_response("Username already exists", 400)
+
+        return json_response({"message": "User registered successfully"}, 201)
+
+    async def login(self, request):
+        data = request.get_json()
+        if not data or not data.get("username") or not data.get("password"):
+            return error_response("Missing required fields: username and password are mandatory", 400)
+
+        store, hasher = self.accounts()
+        user = store.get(data["username"])
+        if user and await self.run_blocking(hasher.verify, data["password"], user["password"]):
+            if hasher.needs_rehash(user["password"]):
+                new_hash = await self.run_blocking(hasher.hash, data["password"])
+                await self.run_blocking(store.update_password, data["username"], new_hash)
+            return json_response({"token": self.create_token(data["username"], user["role"])})
+
+        return error_response("Invalid credentials", 401)
+
+
+def create_asgi_app(database=None, config=None, flask_app=None):
+    return AsyncApp(database, config, flask_app)
+
+
+# The pool is only opened on lifespan startup, so importing this is cheap
+app = create_asgi_app()
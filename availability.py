@@ -0,0 +1,162 @@
+import threading
+
+from schema import BRANCHES, INVENTORY, MANUFACTURERS, VEHICLES
+
+# Denormalised "which branches have vehicle X, and how many" read model. Stock
+# is kept per vehicle and branch with the vehicle and manufacturer names, so
+# /availability is answered from memory without joining four tables.
+
+COLUMNS = {
+    "manufacturers": (MANUFACTURERS, ("manufacturer_ID", "manufacturer_ShortName", "manufacturer_FullName")),
+    "vehicles": (VEHICLES, ("vehicle_ID", "manufacturer_ID", "vehicle_Description")),
+    "branches": (BRANCHES, ("branch_location",)),
+    "inventory": (INVENTORY, ("inventory_ID", "branch_location", "vehicle_ID", "inventory_Count")),
+}
+
+FILTERS = ("vehicle_ID", "manufacturer_ID")
+
+
+class AvailabilityArgsError(ValueError):
+    pass
+
+
+def parse_availability_args(args):
+    filters = {}
+    for name in FILTERS:
+        if args.get(name):
+            try:
+                filters[name] = int(args[name])
+            except ValueError:
+                raise AvailabilityArgsError(f"{name} must be an integer")
+    if not filters:
+        raise AvailabilityArgsError(f"One of {', '.join(FILTERS)} is required")
+    return filters, args.get("branch_location") or None
+
+
+def select_rows(resource, column=None, values=None):
+    # -> (query, params) for every row, or the rows whose column is in values
+    table, columns = COLUMNS[resource]
+    query = f"SELECT {', '.join(columns)} FROM {table.name}"
+    if column is None:
+        return query, ()
+    values = sorted(set(values))
+    return query + f" WHERE {column} IN ({', '.join(['%s'] * len(values))})", values
+
+
+class Availability:
+    def __init__(self):
+        self._manufacturers = {}  # manufacturer_ID -> (short name, full name)
+        self._vehicles = {}  # vehicle_ID -> (manufacturer_ID, description)
+        self._by_manufacturer = {}  # manufacturer_ID -> {vehicle_ID}
+        self._branches = set()
+        self._items = {}  # inventory_ID -> (vehicle_ID, branch_location)
+        self._stock = {}  # vehicle_ID -> {branch_location: {inventory_ID: count}}
+        self._by_branch = {}  # branch_location -> {inventory_ID}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _remove_vehicle(self, vehicle_ID):
+        vehicle = self._vehicles.pop(vehicle_ID, None)
+        if vehicle is not None:
+            self._by_manufacturer[vehicle[0]].discard(vehicle_ID)
+
+    def _remove_item(self, inventory_ID):
+        item = self._items.pop(inventory_ID, None)
+        if item is None:
+            return
+        vehicle_ID, branch = item
+        items = self._by_branch[branch]
+        items.discard(inventory_ID)
+        if not items:
+            del self._by_branch[branch]
+        branches = self._stock[vehicle_ID]
+        del branches[branch][inventory_ID]
+        if not branches[branch]:
+            del branches[branch]
+            if not branches:
+                del self._stock[vehicle_ID]
+
+    def _add(self, resource, row):
+        if resource == "manufacturers":
+            manufacturer_ID, short_name, full_name = row
+            self._manufacturers[manufacturer_ID] = (short_name, full_name)
+        elif resource == "vehicles":
+            vehicle_ID, manufacturer_ID, description = row
+            self._remove_vehicle(vehicle_ID)
+            self._vehicles[vehicle_ID] = (manufacturer_ID, description)
+            self._by_manufacturer.setdefault(manufacturer_ID, set()).add(vehicle_ID)
+        elif resource == "branches":
+            self._branches.add(row[0])
+        else:
+            inventory_ID, branch, vehicle_ID, count = row
+            self._remove_item(inventory_ID)
+            self._items[inventory_ID] = (vehicle_ID, branch)
+            self._stock.setdefault(vehicle_ID, {}).setdefault(branch, {})[inventory_ID] = count
+            self._by_branch.setdefault(branch, set()).add(inventory_ID)
+
+    def add_rows(self, resource, rows):
+        with self._lock:
+            for row in rows:
+                self._add(resource, row)
+
+    def replace(self, resource, keys, rows):
+        # rows are the current versions of keys; keys without a row were deleted
+        with self._lock:
+            for key in keys:
+                if resource == "manufacturers":
+                    self._manufacturers.pop(key, None)
+                elif resource == "vehicles":
+                    self._remove_vehicle(key)
+                elif resource == "branches":
+                    self._branches.discard(key)
+                else:
+                    self._remove_item(key)
+            for row in rows:
+                self._add(resource, row)
+
+    def replace_inventory(self, column, values, rows):
+        # rows are all current inventory rows whose column is in values; used
+        # when deleting a vehicle or branch may have cascaded to its inventory
+        with self._lock:
+            for value in set(values):
+                if column == "vehicle_ID":
+                    inventory_IDs = [i for items in self._stock.get(value, {}).values() for i in items]
+                else:
+                    inventory_IDs = list(self._by_branch.get(value, ()))
+                for inventory_ID in inventory_IDs:
+                    self._remove_item(inventory_ID)
+            for row in rows:
+                self._add("inventory", row)
+
+    def lookup(self, vehicle_ID=None, manufacturer_ID=None, branch_location=None):
+        # -> one dict per (vehicle, branch) with stock, by vehicle_ID then branch
+        with self._lock:
+            if vehicle_ID is not None:
+                vehicle_IDs = [vehicle_ID]
+            else:
+                vehicle_IDs = sorted(self._by_manufacturer.get(manufacturer_ID, ()))
+
+            results = []
+            for v in vehicle_IDs:
+                vehicle = self._vehicles.get(v)
+                if vehicle is None or (manufacturer_ID is not None and vehicle[0] != manufacturer_ID):
+                    continue
+                short_name, full_name = self._manufacturers.get(vehicle[0], (None, None))
+                for branch, items in sorted(self._stock.get(v, {}).items()):
+                    count = sum(items.values())
+                    if count <= 0 or branch not in self._branches:
+                        continue
+                    if branch_location is not None and branch != branch_location:
+                        continue
+                    results.append({
+                        "vehicle_ID": v,
+                        "vehicle_Description": vehicle[1],
+                        "manufacturer_ID": vehicle[0],
+                        "manufacturer_ShortName": short_name,
+                        "manufacturer_FullName": full_name,
+                        "branch_location": branch,
+                        "inventory_Count": count,
+                    })
+        return results
@@ -0,0 +1,59 @@
+# Helpers for the /batch endpoints: validate every item up front, report a
+# result per item, and run the valid ones as a single executemany/commit.
+
+
+class BatchError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def check_batch(data, max_size):
+    if not isinstance(data, list) or not data:
+        raise BatchError("Request body must be a non-empty JSON array")
+    if len(data) > max_size:
+        raise BatchError(f"Batch size exceeds the maximum of {max_size} items", 413)
+
+
+def check_item(item, required, int_fields=()):
+    if not isinstance(item, dict):
+        return "Item must be a JSON object"
+
+    missing = [f for f in required if item.get(f) is None or item.get(f) == ""]
+    if missing:
+        return f"Missing required fields: {', '.join(missing)}"
+
+    for field in int_fields:
+        value = item.get(field)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return f"{field} must be an integer"
+    return None
+
+
+def split_items(items, required, int_fields=()):
+    valid = []
+    results = []
+    for index, item in enumerate(items):
+        error = check_item(item, required, int_fields)
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+        else:
+            valid.append((index, item))
+    return valid, results
+
+
+def existing_keys(cursor, table, keys):
+    # Locks the matched rows for the rest of the transaction
+    keys = list(set(keys))
+    if not keys:
+        return set()
+    placeholders = ", ".join(["%s"] * len(keys))
+    cursor.execute(f"SELECT {table.key} FROM {table.name} WHERE {table.key} IN ({placeholders}) FOR UPDATE", keys)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def summarize(results):
+    results.sort(key=lambda r: r["index"])
+    failed = sum(1 for r in results if r["status"] in ("error", "not_found"))
+    body = {"results": results, "succeeded": len(results) - failed, "failed": failed}
+    return body, 207 if failed else 200
@@ -0,0 +1,459 @@
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import jwt
+
+# Load-test harness for every route in api.py. By default it seeds a SQLite
+# stand-in (sqlite_standin.py), serves the app in-process on a threaded
+# werkzeug server, and drives it over HTTP at fixed concurrency levels.
+# With --target mysql it seeds the configured MySQL database instead, and
+# --url points it at an already running server. Results are JSON so runs can
+# be compared across commits.
+
+DEFAULT_VOLUMES = {"manufacturers": 50, "branches": 20, "vehicles": 500, "inventory": 5000, "users": 50}
+BENCH_PASSWORD = "benchmark-password"
+
+# Routes served by the async mode in asgi.py
+ASGI_SCENARIOS = {
+    "index", "list_manufacturers", "list_branches", "list_vehicles", "list_inventory", "list_inventory_page",
+    "list_inventory_filtered", "export_inventory_ndjson", "login", "register",
+}
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def peak_rss_kb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def boot_time():
+    # Import and create_app() time of a fresh interpreter, i.e. a new worker
+    try:
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import json, api; print(json.dumps(api.boot_stats))"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL,
+        )
+    except Exception:
+        return None
+    return {phase: round(seconds * 1000, 3) for phase, seconds in json.loads(output).items()}
+
+
+def encoding_costs(volumes, repeat=5):
+    # Size and best-of-repeat encode time of the /inventory body per format and
+    # layout, against jsonify on the same rows
+    from flask import Flask
+
+    import serializer
+    from schema import INVENTORY
+
+    app = Flask(__name__)
+    rows = [(i + 1, f"Branch {i % volumes['branches']}", i % volumes["vehicles"] + 1, 1000)
+            for i in range(volumes["inventory"])]
+    encoders = {
+        "jsonify": lambda: app.json.response([dict(zip(INVENTORY.columns, row)) for row in rows]).get_data(),
+    }
+    for fmt in ("json",) + serializer.binary_formats():
+        for layout in serializer.LAYOUTS:
+            encoders[f"{fmt}_{layout}"] = lambda fmt=fmt, layout=layout: serializer.encode_rows(
+                rows, INVENTORY.columns, None, layout, fmt
+            )
+
+    costs = {}
+    with app.app_context():
+        for name, encode in encoders.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                body = encode()
+                timings.append(time.perf_counter() - started)
+            costs[name] = {"bytes": len(body), "encode_ms": round(min(timings) * 1000, 3)}
+    return costs
+
+
+def seed(conn, volumes, reserve):
+    # `reserve` extra rows per table are created for the DELETE scenarios
+    cursor = conn.cursor()
+    manufacturers = volumes["manufacturers"] + reserve
+    cursor.executemany(
+        "INSERT INTO Car_Manufacturers (manufacturer_ShortName, manufacturer_FullName, manufacturer_OtherDetails) VALUES (%s, %s, %s)",
+        [(f"M{i}", f"Manufacturer {i} Corporation", "Automobile manufacturer") for i in range(manufacturers)],
+    )
+    branches = volumes["branches"] + reserve
+    cursor.executemany(
+        "INSERT INTO Branches (branch_location, branch_other_details, branch_Manager_Code) VALUES (%s, %s, %s)",
+        [(f"Branch {i}", f"Branch number {i}", f"MGR{i}") for i in range(branches)],
+    )
+    vehicles = volumes["vehicles"] + reserve
+    cursor.executemany(
+        "INSERT INTO Vehicles (manufacturer_ID, vehicle_Description, vehicle_OtherDetails) VALUES (%s, %s, %s)",
+        [(i % volumes["manufacturers"] + 1, f"Vehicle model {i}", "Standard trim") for i in range(vehicles)],
+    )
+    inventory = volumes["inventory"] + reserve
+    cursor.executemany(
+        "INSERT INTO Inventory (branch_location, vehicle_ID, inventory_Count) VALUES (%s, %s, %s)",
+        [(f"Branch {i % volumes['branches']}", i % volumes["vehicles"] + 1, 1000) for i in range(inventory)],
+    )
+    conn.commit()
+    cursor.close()
+
+
+def seed_users(store, hasher, count):
+    # One hash shared by all seeded users keeps seeding fast at any cost factor
+    hashed = hasher.hash(BENCH_PASSWORD)
+    for i in range(count):
+        store.add(f"bench-user-{i}", hashed, "admin")
+
+
+def scenarios(volumes, reserve, token):
+    auth = {"x-access-token": token}
+    counter = itertools.count()
+    m, b, v, inv = volumes["manufacturers"], volumes["branches"], volumes["vehicles"], volumes["inventory"]
+    reserved = {
+        "manufacturers": iter(range(m + 1, m + reserve + 1)),
+        "branches": iter(range(b, b + reserve)),
+        "vehicles": iter(range(v + 1, v + reserve + 1)),
+        "inventory": iter(range(inv + 1, inv + reserve + 1)),
+    }
+    lock = threading.Lock()
+
+    def take(table):
+        with lock:
+            return next(reserved[table], None)
+
+    def n():
+        return next(counter)
+
+    # (name, method, path factory, body factory, headers)
+    return [
+        ("index", "GET", lambda: "/", None, {}),
+        ("list_manufacturers", "GET", lambda: "/manufacturers", None, {}),
+        ("list_branches", "GET", lambda: "/branches", None, {}),
+        ("list_vehicles", "GET", lambda: "/vehicles", None, auth),
+        ("list_inventory", "GET", lambda: "/inventory", None, {}),
+        ("list_inventory_page", "GET", lambda: f"/inventory?limit=100&after={n() % inv}", None, {}),
+        ("list_inventory_filtered", "GET", lambda: f"/inventory?branch_location=Branch%20{n() % b}", None, {}),
+        ("export_inventory_ndjson", "GET", lambda: "/inventory?stream=1", None, {"Accept": "application/x-ndjson"}),
+        ("list_inventory_msgpack", "GET", lambda: "/inventory", None, {"Accept": "application/msgpack"}),
+        ("list_inventory_msgpack_columnar", "GET", lambda: "/inventory?format=columnar", None,
+         {"Accept": "application/msgpack"}),
+        ("list_inventory_cbor", "GET", lambda: "/inventory", None, {"Accept": "application/cbor"}),
+        ("inventory_summary", "GET", lambda: "/inventory/summary?group_by=manufacturer_ID", None, {}),
+        ("changes", "GET", lambda: "/changes?since=0", None, auth),
+        ("availability", "GET", lambda: f"/availability?vehicle_ID={n() % v + 1}", None, auth),
+        ("search", "GET", lambda: f"/search?q=vehicle%20mod%20{n() % v}", None, auth),
+        ("login", "POST", lambda: "/login",
+         lambda: {"username": f"bench-user-{n() % max(volumes['users'], 1)}", "password": BENCH_PASSWORD}, {}),
+        ("register", "POST", lambda: "/register",
+         lambda: {"username": f"bench-new-{os.getpid()}-{n()}", "password": BENCH_PASSWORD, "role": "manager"}, {}),
+        ("add_manufacturer", "POST", lambda: "/manufacturers",
+         lambda: {"manufacturer_ShortName": "Bench", "manufacturer_FullName": "Bench Motors"}, auth),
+        ("update_manufacturer", "PUT", lambda: f"/manufacturers/{n() % m + 1}",
+         lambda: {"manufacturer_ShortName": "Upd", "manufacturer_FullName": "Updated Motors"}, {}),
+        ("update_branch", "PUT", lambda: f"/branches/Branch%20{n() % b}",
+         lambda: {"branch_Manager_Code": "MGR"}, {}),
+        ("update_vehicle", "PUT", lambda: f"/vehicles/{n() % v + 1}",
+         lambda: {"vehicle_Description": "Updated model"}, {}),
+        ("update_inventory", "PUT", lambda: f"/inventory/{n() % inv + 1}", lambda: {"inventory_Count": 500}, auth),
+        ("adjust_inventory", "PATCH", lambda: f"/inventory/{n() % inv + 1}", lambda: {"delta": 1}, auth),
+        ("batch_update_inventory", "PUT", lambda: "/inventory/batch",
+         lambda: [{"inventory_ID": (n() % inv) + 1, "inventory_Count": 700} for _ in range(100)], auth),
+        ("batch_add_inventory", "POST", lambda: "/inventory/batch",
+         lambda: [{"branch_location": "Branch 0", "vehicle_ID": 1, "inventory_Count": 1} for _ in range(100)], auth),
+        ("delete_manufacturer", "DELETE", lambda: f"/manufacturers/{take('manufacturers') or 0}", None, {}),
+        ("delete_branch", "DELETE", lambda: f"/branches/Branch%20{take('branches')}", None, {}),
+        ("delete_vehicle", "DELETE", lambda: f"/vehicles/{take('vehicles') or 0}", None, {}),
+        ("delete_inventory", "DELETE", lambda: f"/inventory/{take('inventory') or 0}", None, auth),
+    ]
+
+
+def drive(base_url, scenario, concurrency, requests):
+    name, method, path_factory, body_factory, headers = scenario
+    parts = urlsplit(base_url)
+    latencies = []
+    errors = []
+    sizes = []
+    lock = threading.Lock()
+    remaining = itertools.count()
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+        local = []
+        local_sizes = []
+        local_errors = 0
+        while next(remaining) < requests:
+            body = json.dumps(body_factory()) if body_factory else None
+            request_headers = dict(headers)
+            if body is not None:
+                request_headers["Content-Type"] = "application/json"
+            started = time.perf_counter()
+            try:
+                conn.request(method, path_factory(), body=body, headers=request_headers)
+                response = conn.getresponse()
+                local_sizes.append(len(response.read()))
+                if response.status >= 500 or response.status in (401, 403, 429):
+                    local_errors += 1
+            except Exception:
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            sizes.extend(local_sizes)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "route": name,
+        "method": method,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "seconds": round(elapsed, 4),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "response_bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def setup_in_process(args, workdir, volumes, reserve):
+    import api
+    from config import DEFAULT_CONCURRENCY_LIMITS
+    from queries import check_plans
+
+    overrides = {"BCRYPT_ROUNDS": args.bcrypt_rounds, "USER_STORE_PATH": os.path.join(workdir, "users.db")}
+    if not args.admission:
+        overrides["RATE_LIMIT_ENABLED"] = False
+        overrides["CONCURRENCY_LIMITS"] = {route_class: 0 for route_class in DEFAULT_CONCURRENCY_LIMITS}
+    connect = None
+    if args.target == "sqlite":
+        import sqlite_standin
+
+        path = os.path.join(workdir, "car_dealership.sqlite")
+        sqlite_standin.create_schema(path)
+        connect = lambda host, port: sqlite_standin.connect(path)
+        # The stand-in schema includes the change log tables
+        overrides["CHANGE_LOG_ENABLED"] = True
+        # Stand-in replicas share the primary's file, so this measures routing, not replication
+        overrides["MYSQL_REPLICAS"] = [f"standin-{i}" for i in range(args.replicas)]
+    app = api.create_app(overrides, connect=connect)
+
+    with app.app_context():
+        seed_users(api.get_user_store(), api.get_password_hasher(), volumes["users"])
+
+    conn = api.db.get_pool()._connect()
+    try:
+        if args.seed or args.target == "sqlite":
+            seed(conn, volumes, reserve)
+        # Full scans on the filtered columns show up here before they show up as latency
+        plan_warnings = check_plans(conn.cursor())
+    finally:
+        conn.close()
+    if not args.quiet:
+        for warning in plan_warnings:
+            print(f"EXPLAIN {warning}", file=sys.stderr)
+
+    if args.server == "wsgi":
+        return app, plan_warnings
+
+    from asgi import AioMySQLDatabase, ExecutorDatabase, create_asgi_app
+
+    if args.target == "sqlite":
+        database = ExecutorDatabase(api.db.get_pool()._connect, size=app.config["MYSQL_POOL_SIZE"])
+    else:
+        database = AioMySQLDatabase(app.config)
+    return create_asgi_app(database, app.config, app), plan_warnings
+
+
+def serve(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def serve_asgi(app):
+    import socket
+
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    class Handle:
+        def shutdown(self):
+            server.should_exit = True
+            thread.join()
+
+    return Handle(), f"http://127.0.0.1:{port}"
+
+
+def run(args):
+    volumes = {name: getattr(args, name) for name in DEFAULT_VOLUMES}
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    reserve = args.requests * len(concurrency_levels)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        plan_warnings = None
+        encodings = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+            secret = args.secret_key
+        else:
+            app, plan_warnings = setup_in_process(args, workdir, volumes, reserve)
+            encodings = encoding_costs(volumes)
+            server, base_url = serve(app) if args.server == "wsgi" else serve_asgi(app)
+            secret = app.config["SECRET_KEY"]
+
+        token = jwt.encode(
+            {"user_id": "benchmark", "role": "admin",
+             "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=6)},
+            secret,
+            algorithm="HS256",
+        )
+
+        selected = set(args.routes.split(",")) if args.routes else None
+        results = []
+        try:
+            for scenario in scenarios(volumes, reserve, token):
+                if selected and scenario[0] not in selected:
+                    continue
+                if args.server == "asgi" and scenario[0] not in ASGI_SCENARIOS:
+                    continue
+                for concurrency in concurrency_levels:
+                    result = drive(base_url, scenario, concurrency, args.requests)
+                    results.append(result)
+                    if not args.quiet:
+                        print(
+                            f"{result['route']:<26} c={concurrency:<4} {result['rps']:>10.1f} req/s  "
+                            f"p50={result['latency_ms']['p50']:.2f}ms p99={result['latency_ms']['p99']:.2f}ms "
+                            f"errors={result['errors']}",
+                            file=sys.stderr,
+                        )
+        finally:
+            if server is not None:
+                server.shutdown()
+                import api
+
+                api.password_hasher.shutdown()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": "url" if args.url else args.target,
+            "server": args.server,
+            "volumes": volumes,
+            "requests_per_level": args.requests,
+            "concurrency": concurrency_levels,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "replicas": args.replicas,
+            "boot_ms": None if args.url else boot_time(),
+            "plan_warnings": plan_warnings,
+            "encodings": encodings,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every route of the Car Dealership API")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite",
+                        help="database behind the in-process server (default: SQLite stand-in)")
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi",
+                        help="serve the threaded Flask app or the async mode from asgi.py (read routes, /login, /register)")
+    parser.add_argument("--seed", action="store_true", help="seed the MySQL target before running")
+    parser.add_argument("--url", help="benchmark an already running server instead of an in-process one")
+    parser.add_argument("--secret-key", default=os.environ.get("SECRET_KEY", "your_secret_key"),
+                        help="token signing key of the server given by --url")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--routes", help="comma-separated scenario names to run (default: all)")
+    parser.add_argument("--admission", action="store_true",
+                        help="keep rate limits and concurrency caps on (default: off, to measure raw throughput)")
+    parser.add_argument("--replicas", type=int, default=0,
+                        help="route reads over this many SQLite stand-in replicas (MySQL: set MYSQL_REPLICAS)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=int(os.environ.get("BCRYPT_ROUNDS", 12)))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--quiet", action="store_true", help="don't print progress to stderr")
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument(f"--{name}", type=int, default=default, help=f"rows to seed (default: {default})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
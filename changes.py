@@ -0,0 +1,155 @@
+import threading
+import time
+
+from schema import TABLES
+
+# Change log for incremental sync. The write handlers append (table, op, key)
+# entries in the same transaction as the write, and /changes?since=<seq>
+# returns the entries after seq together with the current version of each
+# row, so a client replica is kept up to date at a cost proportional to the
+# number of changes rather than the table size.
+#
+# Sequence numbers come from a single counter row that stays locked until the
+# writing transaction commits, so seq order is commit order: once a reader
+# has seen seq N, no entry below N can appear later.
+
+
+class ChangeArgsError(ValueError):
+    pass
+
+
+class ChangeLogGone(Exception):
+    pass
+
+
+def parse_changes_args(args, max_wait):
+    try:
+        since = int(args["since"]) if args.get("since", "") != "" else None
+        wait = float(args.get("wait", 0))
+    except ValueError:
+        raise ChangeArgsError("since must be an integer and wait a number of seconds")
+    if since is not None and since < 0:
+        raise ChangeArgsError("since must not be negative")
+    if not 0 <= wait <= max_wait:
+        raise ChangeArgsError(f"wait must be between 0 and {max_wait} seconds")
+
+    tables = [t for t in args.get("tables", "").split(",") if t]
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        raise ChangeArgsError(f"Unknown tables: {', '.join(unknown)}")
+    return since, wait, tuple(tables)
+
+
+def resource_for(table):
+    return next(resource for resource, t in TABLES.items() if t is table)
+
+
+def lock(cursor):
+    # Blocks other logging writers until this transaction ends
+    cursor.execute("SELECT seq FROM Change_Log_Seq WHERE id = 1 FOR UPDATE")
+    return cursor.fetchone()[0]
+
+
+def append(cursor, changes, seq=None):
+    # changes: [(resource, op, key), ...]; pass seq from an earlier lock() in
+    # this transaction, if any
+    if seq is None:
+        seq = lock(cursor)
+    now = time.time()
+    cursor.executemany(
+        "INSERT INTO Change_Log (seq, table_name, op, row_key, changed_at) VALUES (%s, %s, %s, %s, %s)",
+        [(seq + i, resource, op, str(key), now) for i, (resource, op, key) in enumerate(changes, 1)],
+    )
+    seq += len(changes)
+    cursor.execute("UPDATE Change_Log_Seq SET seq = %s WHERE id = 1", (seq,))
+    return seq
+
+
+def prune(cursor, before):
+    cursor.execute("DELETE FROM Change_Log WHERE changed_at < %s", (before,))
+
+
+def _current_rows(cursor, entries):
+    # {(resource, key): row dict} for every entry that isn't a delete
+    wanted = {}
+    for _, resource, op, key, _ in entries:
+        if op != "delete":
+            wanted.setdefault(resource, set()).add(key)
+
+    rows = {}
+    for resource, keys in sorted(wanted.items()):
+        table = TABLES[resource]
+        keys = sorted(keys)
+        placeholders = ", ".join(["%s"] * len(keys))
+        cursor.execute(
+            f"SELECT {', '.join(table.columns)} FROM {table.name} WHERE {table.key} IN ({placeholders})", keys
+        )
+        index = table.columns.index(table.key)
+        for row in cursor.fetchall():
+            rows[(resource, row[index])] = dict(zip(table.columns, row))
+    return rows
+
+
+def _decode_key(resource, row_key):
+    table = TABLES[resource]
+    return int(row_key) if table.key in table.int_columns else row_key
+
+
+def latest(cursor):
+    cursor.execute("SELECT seq FROM Change_Log_Seq WHERE id = 1")
+    return cursor.fetchone()[0]
+
+
+def read(cursor, since, limit, tables=()):
+    head = latest(cursor)
+    if since > head:
+        raise ChangeLogGone("since is ahead of the change log")
+    if since < head:
+        cursor.execute("SELECT MIN(seq) FROM Change_Log")
+        oldest = cursor.fetchone()[0]
+        if oldest is None or oldest > since + 1:
+            raise ChangeLogGone("since is older than the retained change log")
+
+    query = "SELECT seq, table_name, op, row_key, changed_at FROM Change_Log WHERE seq > %s AND seq <= %s"
+    params = [since, head]
+    if tables:
+        query += f" AND table_name IN ({', '.join(['%s'] * len(tables))})"
+        params.extend(tables)
+    cursor.execute(query + " ORDER BY seq LIMIT %s", params + [limit + 1])
+    entries = [
+        (seq, resource, op, _decode_key(resource, row_key), changed_at)
+        for seq, resource, op, row_key, changed_at in cursor.fetchall()
+    ]
+
+    more = len(entries) > limit
+    entries = entries[:limit]
+    rows = _current_rows(cursor, entries)
+    # The row is the current version, or null once it has been deleted
+    changes = [
+        {"seq": seq, "table": resource, "op": op, "key": key, "changed_at": changed_at,
+         "row": rows.get((resource, key)) if op != "delete" else None}
+        for seq, resource, op, key, changed_at in entries
+    ]
+    return {"changes": changes, "next_since": entries[-1][0] if more else head, "more": more}
+
+
+# Wakes long-polling readers in this process when a write commits. Writes in
+# other workers are picked up by the readers' periodic re-check.
+class ChangeNotifier:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+
+    @property
+    def version(self):
+        with self._cond:
+            return self._version
+
+    def notify(self):
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def wait(self, seen, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._version != seen, timeout)
@@ -0,0 +1,71 @@
+import gzip
+
+# Negotiated response compression. gzip is always available; brotli and
+# zstandard are used when installed. Output is deterministic (no gzip mtime)
+# so the same body always compresses to the same bytes.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Server preference when the client rates several encodings equally
+PREFERENCE = ("zstd", "br", "gzip")
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+LEVEL_RANGES = {"zstd": (1, 22), "br": (0, 11), "gzip": (0, 9)}
+
+
+def available_encodings():
+    installed = {"zstd": zstandard is not None, "br": brotli is not None, "gzip": True}
+    return tuple(e for e in PREFERENCE if installed[e])
+
+
+def parse_accept_encoding(header):
+    # "gzip;q=0.8, br" -> {"gzip": 0.8, "br": 1.0}
+    weights = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def negotiate(header, encodings):
+    weights = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body, encoding, level=None):
+    if level is None:
+        level = DEFAULT_LEVELS[encoding]
+    elif encoding in LEVEL_RANGES:
+        # Each codec has its own scale; out-of-range levels are clamped
+        low, high = LEVEL_RANGES[encoding]
+        level = min(max(level, low), high)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
@@ -0,0 +1,162 @@
+import copy
+import json
+import os
+
+from flask import Config
+
+# Every setting the app reads, with its type and default. create_app()
+# resolves them in this order, later sources winning:
+#   1. the defaults below
+#   2. a config file: create_app(config_file=...) or API_CONFIG_FILE (.json or .py)
+#   3. environment variables of the same name
+#   4. the mapping passed to create_app(), e.g. by tests and the benchmark
+# Settings of type dict (RATE_LIMITS, CONCURRENCY_LIMITS, COMPRESSION_LEVELS)
+# are merged one level deep, so an override only has to name the classes it
+# changes.
+
+DEFAULT_RATE_LIMITS = {
+    "login": {"ip": "30/minute", "username": "10/minute"},
+    "register": {"ip": "10/minute"},
+    "list": {"ip": "600/minute"},
+    "export": {"ip": "30/minute"},
+    "write": {"user": "600/minute", "ip": "600/minute"},
+    "changes": {"user": "120/minute"},
+}
+
+DEFAULT_CONCURRENCY_LIMITS = {"login": 32, "register": 8, "list": 32, "export": 4, "write": 16, "changes": 64}
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _dict(value):
+    return json.loads(value) if isinstance(value, str) else dict(value)
+
+
+def _list(value):
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(value)
+
+
+def _optional(parse):
+    def parse_optional(value):
+        return None if value is None or value == "" else parse(value)
+    return parse_optional
+
+
+SETTINGS = {
+    # Database
+    "MYSQL_HOST": (str, "localhost"),
+    "MYSQL_PORT": (int, 3306),
+    "MYSQL_USER": (str, "root"),
+    "MYSQL_PASSWORD": (str, "root"),
+    "MYSQL_DB": (str, "car_dealership"),
+    "MYSQL_POOL_SIZE": (int, 10),
+    "MYSQL_POOL_TIMEOUT": (float, 5.0),
+    "MYSQL_POOL_MAX_LIFETIME": (int, 3600),
+    "MYSQL_POOL_IDLE_TIMEOUT": (int, 300),
+    "MYSQL_POOL_PING_INTERVAL": (int, 30),
+    "MYSQL_REPLICAS": (_list, []),
+    "REPLICA_MAX_LAG": (float, 5.0),
+    "REPLICA_CHECK_INTERVAL": (float, 5.0),
+    # Auth
+    "SECRET_KEY": (str, "your_secret_key"),
+    "TOKEN_CACHE_SIZE": (int, 10000),
+    "TOKEN_CACHE_TTL": (int, 300),
+    "USER_STORE_PATH": (str, "users.db"),
+    "LEGACY_USERS_JSON": (str, "users.json"),
+    "BCRYPT_ROUNDS": (int, 12),
+    "BCRYPT_WORKERS": (int, os.cpu_count() or 1),
+    "BCRYPT_MAX_QUEUE": (int, 32),
+    "BCRYPT_USE_PROCESSES": (_bool, True),
+    # Metrics
+    "METRICS_ENABLED": (_bool, True),
+    "SLOW_QUERY_MS": (float, 0.0),
+    "BOOT_TIME_BUDGET_MS": (float, 500.0),
+    # Rate limiting and admission control
+    "RATE_LIMIT_ENABLED": (_bool, True),
+    "RATE_LIMIT_REDIS_URL": (_optional(str), None),
+    "RATE_LIMITS": (_dict, DEFAULT_RATE_LIMITS),
+    "CONCURRENCY_LIMITS": (_dict, DEFAULT_CONCURRENCY_LIMITS),
+    "ADMISSION_WAIT": (float, 0.0),
+    # Caching, conditional requests and compression
+    "RESPONSE_CACHE_TTL": (int, 60),
+    "RESPONSE_CACHE_REDIS_URL": (_optional(str), None),
+    "TABLE_VERSIONS_TTL": (int, 60),
+    "COMPRESSION_ENABLED": (_bool, True),
+    "COMPRESSION_MIN_SIZE": (int, 1024),
+    "COMPRESSION_LEVELS": (_dict, {}),
+    "COALESCE_READS": (_bool, True),
+    "BINARY_FORMATS_ENABLED": (_bool, True),
+    # Listing and writes
+    "MAX_PAGE_SIZE": (int, 1000),
+    "STREAM_BATCH_SIZE": (int, 1000),
+    "BATCH_MAX_SIZE": (int, 1000),
+    "INVENTORY_SUMMARY_MATERIALIZED": (_bool, False),
+    "IDEMPOTENCY_TTL": (int, 24 * 3600),
+    "IDEMPOTENCY_MAX_KEYS": (int, 100000),
+    # Twice gunicorn's default worker timeout of 30 seconds
+    "IDEMPOTENCY_PENDING_TTL": (int, 60),
+    # Background jobs
+    "JOB_WORKERS": (int, 2),
+    "JOB_MAX_QUEUE": (int, 100),
+    "JOB_MAX_ATTEMPTS": (int, 3),
+    "JOB_RETRY_BACKOFF": (float, 1.0),
+    "JOB_RETENTION": (int, 3600),
+    "JOB_IMPORT_MAX_SIZE": (int, 100000),
+    # In-memory read models
+    "SEARCH_PAGE_SIZE": (int, 10),
+    "SEARCH_INDEX_REFRESH": (int, 60),
+    "AVAILABILITY_REFRESH": (int, 60),
+    # Change feed
+    "CHANGE_LOG_ENABLED": (_bool, False),
+    "CHANGE_LOG_RETENTION": (int, 7 * 24 * 3600),
+    "CHANGES_PAGE_SIZE": (int, 1000),
+    "CHANGES_MAX_WAIT": (int, 30),
+    "CHANGES_POLL_INTERVAL": (float, 1.0),
+    "CHANGES_STREAM_SECONDS": (float, 300.0),
+}
+
+
+def read_config_file(path):
+    config = Config(os.getcwd())
+    if path.endswith(".json"):
+        config.from_file(path, load=json.load)
+    else:
+        config.from_pyfile(path)
+    return dict(config)
+
+
+def _apply(values, source, parse_all):
+    for name, value in source.items():
+        if name not in SETTINGS:
+            values[name] = value
+            continue
+        parse, _ = SETTINGS[name]
+        value = parse(value) if parse_all or isinstance(value, str) else value
+        if parse is _dict:
+            for key, rules in value.items():
+                if isinstance(rules, dict) and isinstance(values[name].get(key), dict):
+                    values[name][key].update(rules)
+                else:
+                    values[name][key] = rules
+        else:
+            values[name] = value
+
+
+def load_config(app, overrides=None, config_file=None):
+    values = {name: copy.deepcopy(default) for name, (_, default) in SETTINGS.items()}
+
+    config_file = config_file or os.environ.get("API_CONFIG_FILE")
+    if config_file:
+        _apply(values, read_config_file(config_file), parse_all=True)
+    _apply(values, {name: os.environ[name] for name in SETTINGS if name in os.environ}, parse_all=True)
+    if overrides:
+        _apply(values, overrides, parse_all=False)
+
+    app.config.update(values)
+    return app.config
@@ -0,0 +1,469 @@
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, request
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+
+# Bounded pool of MySQLdb connections. Connections are checked for liveness
+# (ping) when they have been idle for a while, and closed once they exceed
+# max_lifetime or idle_timeout so the server never sees stale sessions.
+class ConnectionPool:
+    def __init__(self, connect, size=10, timeout=5, max_lifetime=3600, idle_timeout=300, ping_interval=30):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "ping_failures": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _expired(self, pooled, now):
+        if self.max_lifetime and now - pooled.created_at > self.max_lifetime:
+            return True
+        return bool(self.idle_timeout) and now - pooled.last_used > self.idle_timeout
+
+    def _close(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
+
+    def _healthy(self, pooled, now):
+        if now - pooled.last_used < self.ping_interval:
+            return True
+        try:
+            pooled.conn.ping()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["ping_failures"] += 1
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                waited = True
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout("Timed out waiting for a database connection")
+                self._cond.wait(remaining)
+            pooled = self._idle.pop() if self._idle else None
+            self._in_use += 1
+
+            wait = time.monotonic() - started
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_seconds_total"] += wait
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait)
+
+        try:
+            now = time.time()
+            if pooled is not None and (self._expired(pooled, now) or not self._healthy(pooled, now)):
+                self._close(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = PooledConnection(self._connect())
+                with self._cond:
+                    self._stats["created"] += 1
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return pooled
+
+    def release(self, pooled, discard=False):
+        if discard:
+            self._close(pooled)
+        else:
+            pooled.last_used = time.time()
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        pooled = self.acquire()
+        try:
+            yield pooled.conn
+        except Exception:
+            self.release(pooled, discard=not _rollback(pooled.conn))
+            raise
+        self.release(pooled, discard=not _rollback(pooled.conn))
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def close_idle(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+
+def _ignore(*args):
+    pass
+
+
+def _rollback(conn):
+    # Returns False when the connection is unusable and must not go back to the pool
+    try:
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def server_side_cursorclass(conn):
+    # MySQLdb buffers a whole result set unless asked for its unbuffered
+    # cursor; other drivers (the SQLite stand-in) read rows as they go
+    if type(conn).__module__.startswith("MySQLdb."):
+        from MySQLdb.cursors import SSCursor
+
+        return SSCursor
+    return None
+
+
+def replica_lag(conn):
+    # Seconds the replica is behind its source, or None if it isn't replicating
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+            column = "Seconds_Behind_Source"
+        except Exception:
+            # MySQL before 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+            column = "Seconds_Behind_Master"
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([d[0] for d in cursor.description], row))[column]
+    finally:
+        cursor.close()
+
+
+# A read replica with its own pool. Its lag is measured at most every
+# check_interval seconds, by whichever request finds the measurement stale.
+class Replica:
+    def __init__(self, name, pool, lag=replica_lag):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self._measure = lag
+        self._checked_at = None
+        self._check_lock = threading.Lock()
+
+    def usable(self, max_lag, check_interval):
+        now = time.monotonic()
+        stale = self._checked_at is None or now - self._checked_at >= check_interval
+        if stale and self._check_lock.acquire(blocking=False):
+            try:
+                with self.pool.connection() as conn:
+                    self.lag = self._measure(conn)
+            except Exception:
+                self.lag = None
+            finally:
+                self._checked_at = now
+                self._check_lock.release()
+        return self.lag is not None and self.lag <= max_lag
+
+    def mark_down(self):
+        self.lag = None
+        self._checked_at = time.monotonic()
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats["lag_seconds"] = self.lag
+        return stats
+
+
+# Cursor wrapper that reports every statement to on_query(query, seconds, rows)
+# and every fetch to on_fetch(query, seconds, rows); everything else is passed through.
+class InstrumentedCursor:
+    def __init__(self, cursor, on_query, on_fetch):
+        self._cursor = cursor
+        self._on_query = on_query
+        self._on_fetch = on_fetch
+        self._query = ""
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, query, args=None):
+        self._query = query
+        started = time.perf_counter()
+        result = self._cursor.execute(query, args)
+        self._on_query(query, time.perf_counter() - started, self._cursor.rowcount)
+        return result
+
+    def executemany(self, query, args):
+        self._query = query
+        started = time.perf_counter()
+        result = self._cursor.executemany(query, args)
+        self._on_query(query, time.perf_counter() - started, self._cursor.rowcount)
+        return result
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        rows = getattr(self._cursor, method)(*args)
+        self._on_fetch(self._query, time.perf_counter() - started, len(rows) if rows else 0)
+        return rows
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def fetchmany(self, size=None):
+        return self._fetch("fetchmany", size) if size is not None else self._fetch("fetchmany")
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._on_fetch(self._query, time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+
+# Clients that wrote read from the primary until this cookie's timestamp
+STICKY_COOKIE = "db_primary_until"
+
+
+# Flask integration: one pooled connection per request, returned to the pool
+# (rolled back if left uncommitted) when the app context is torn down.
+#
+# Handlers marked read-only (g.db_read_only) are sent to a replica: the least
+# busy one whose lag is within REPLICA_MAX_LAG, else the primary. A request
+# that commits sets a cookie that keeps the client on the primary for
+# REPLICA_MAX_LAG seconds, so it reads its own writes.
+class Database:
+    def __init__(self, app=None, on_query=None, on_fetch=None):
+        self.app = app
+        self.pool = None
+        self.replicas = None
+        self.on_query = on_query
+        self.on_fetch = on_fetch
+        self.connect = None
+        self._insert_id_step = None
+        self._pool_lock = threading.Lock()
+        self._round_robin = itertools.count()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, connect=None):
+        # connect(host, port) opens a connection with a driver other than
+        # MySQLdb (e.g. the SQLite stand-in); pools built for a previous app
+        # are closed
+        self.close()
+        self.app = app
+        self.connect = connect
+        app.after_request(self._stick_to_primary)
+        app.teardown_appcontext(self.teardown)
+
+    def _create_pool(self, host=None, port=None):
+        config = self.app.config
+
+        def connect():
+            if self.connect is not None:
+                return self.connect(host or config["MYSQL_HOST"], port or config["MYSQL_PORT"])
+            import MySQLdb
+
+            return MySQLdb.connect(
+                host=host or config["MYSQL_HOST"],
+                port=port or config["MYSQL_PORT"],
+                user=config["MYSQL_USER"],
+                passwd=config["MYSQL_PASSWORD"],
+                db=config["MYSQL_DB"],
+                charset="utf8mb4",
+            )
+
+        return ConnectionPool(
+            connect,
+            size=config["MYSQL_POOL_SIZE"],
+            timeout=config["MYSQL_POOL_TIMEOUT"],
+            max_lifetime=config["MYSQL_POOL_MAX_LIFETIME"],
+            idle_timeout=config["MYSQL_POOL_IDLE_TIMEOUT"],
+            ping_interval=config["MYSQL_POOL_PING_INTERVAL"],
+        )
+
+    def get_pool(self):
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = self._create_pool()
+        return self.pool
+
+    def get_replicas(self):
+        # MYSQL_REPLICAS: ["host", "host:port", ...], same credentials as the primary
+        if self.replicas is None:
+            with self._pool_lock:
+                if self.replicas is None:
+                    replicas = []
+                    for address in self.app.config["MYSQL_REPLICAS"]:
+                        host, _, port = address.partition(":")
+                        replicas.append(Replica(address, self._create_pool(host, int(port) if port else None)))
+                    self.replicas = replicas
+        return self.replicas
+
+    def reads_from_replica(self):
+        if not g.get("db_read_only"):
+            return False
+        try:
+            return float(request.cookies.get(STICKY_COOKIE) or 0) <= time.time()
+        except ValueError:
+            return True
+
+    def _choose_replica(self):
+        config = self.app.config
+        usable = [r for r in self.get_replicas() if r.usable(config["REPLICA_MAX_LAG"], config["REPLICA_CHECK_INTERVAL"])]
+        if not usable:
+            return None
+        # Least connections in use; ties rotate
+        start = next(self._round_robin) % len(usable)
+        return min(usable[start:] + usable[:start], key=lambda r: r.pool.in_use)
+
+    def _checkout(self):
+        if self.reads_from_replica():
+            replica = self._choose_replica()
+            if replica is not None:
+                try:
+                    return replica.pool, replica.pool.acquire()
+                except PoolTimeout:
+                    raise
+                except Exception:
+                    # Unreachable: skip it until the next lag check
+                    replica.mark_down()
+        pool = self.get_pool()
+        return pool, pool.acquire()
+
+    @property
+    def connection(self):
+        if "db_conn" not in g:
+            g.db_pool, g.db_conn = self._checkout()
+        return g.db_conn.conn
+
+    def open_cursor(self, server_side=False):
+        # The caller is responsible for closing the cursor; prefer cursor().
+        # A server-side cursor streams rows from the server as they are fetched
+        conn = self.connection
+        cursorclass = server_side_cursorclass(conn) if server_side else None
+        cursor = conn.cursor(cursorclass) if cursorclass else conn.cursor()
+        if self.on_query or self.on_fetch:
+            cursor = InstrumentedCursor(cursor, self.on_query or _ignore, self.on_fetch or _ignore)
+        return cursor
+
+    @contextmanager
+    def cursor(self, server_side=False):
+        cursor = self.open_cursor(server_side)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def insert_id_step(self):
+        # -> the step between the ids of one multi-row INSERT, or 0 when they
+        # may not be evenly spaced: innodb_autoinc_lock_mode=2 (the MySQL 8
+        # default) lets concurrent inserts interleave. Both settings need a
+        # server restart to change, so they are read once per pool.
+        if self._insert_id_step is None:
+            with self.cursor() as cursor:
+                cursor.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+                lock_mode, increment = cursor.fetchone()
+            self._insert_id_step = 0 if int(lock_mode) == 2 else int(increment)
+        return self._insert_id_step
+
+    def commit(self):
+        self.connection.commit()
+        g.db_wrote = True
+
+    def release(self):
+        # Returns the request's connection to the pool early (e.g. before a
+        # long wait); the next db access in the request checks out a new one
+        pooled = g.pop("db_conn", None)
+        pool = g.pop("db_pool", self.pool)
+        if pooled is not None:
+            pool.release(pooled, discard=not _rollback(pooled.conn))
+
+    def use_primary(self):
+        # Sends the rest of the request to the primary, e.g. to read rows that
+        # were just committed
+        self.release()
+        g.db_read_only = False
+
+    def _stick_to_primary(self, response):
+        if g.get("db_wrote") and (self.replicas or self.app.config["MYSQL_REPLICAS"]):
+            window = self.app.config["REPLICA_MAX_LAG"]
+            response.set_cookie(
+                STICKY_COOKIE, str(math.ceil(time.time() + window)), max_age=math.ceil(window) + 1,
+                httponly=True, samesite="Lax",
+            )
+        return response
+
+    def teardown(self, exception):
+        self.release()
+
+    def close(self):
+        # Closes the idle connections and drops the pools; connections still
+        # checked out go back to the old pool and are dropped with it
+        with self._pool_lock:
+            pools = ([self.pool] if self.pool else []) + [replica.pool for replica in self.replicas or ()]
+            self.pool = None
+            self.replicas = None
+            self._insert_id_step = None
+        for pool in pools:
+            pool.close_idle()
+
+    def stats(self):
+        if self.pool is None:
+            stats = {"size": self.app.config["MYSQL_POOL_SIZE"], "in_use": 0, "idle": 0}
+        else:
+            stats = self.pool.stats()
+        if self.replicas:
+            stats["replicas"] = {replica.name: replica.stats() for replica in self.replicas}
+        return stats
@@ -0,0 +1,122 @@
+import threading
+import time
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+# Worker-side functions: module level so they can be pickled for a process pool
+# bcrypt and the executors are imported on first use to keep worker boot fast
+def _hash_password(password, rounds, submitted_at):
+    import bcrypt
+
+    started = time.time()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    return hashed, started - submitted_at, time.time() - started
+
+
+def _check_password(password, hashed, submitted_at):
+    import bcrypt
+
+    started = time.time()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, started - submitted_at, time.time() - started
+
+
+def hash_rounds(hashed):
+    # "$2b$12$..." -> 12
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+# Runs bcrypt off the request thread on a bounded pool. At most
+# workers + max_queue operations may be in flight; anything beyond that is
+# rejected with PoolSaturated instead of queueing behind other requests. A
+# request that waits more than timeout seconds also gets PoolSaturated, but
+# its operation keeps its slot until it has actually finished.
+class PasswordHasher:
+    def __init__(self, workers=2, max_queue=16, rounds=12, use_processes=True, timeout=30, on_complete=None):
+        self.rounds = rounds
+        self.timeout = timeout
+        # on_complete(operation, seconds, queue_wait_seconds) is called after every hash/verify
+        self.on_complete = on_complete
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "hash_count": 0,
+            "verify_count": 0,
+            "rejected_count": 0,
+            "timeout_count": 0,
+            "in_flight": 0,
+            "hash_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+        }
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats["rejected_count"] += 1
+            raise PoolSaturated("Password hashing pool is saturated")
+
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+
+        with self._stats_lock:
+            self._stats["in_flight"] += 1
+        try:
+            future = self._executor.submit(fn, *args, time.time())
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            result, queue_wait, elapsed = future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._stats_lock:
+                self._stats["timeout_count"] += 1
+            raise PoolSaturated("Timed out waiting for the password hashing pool")
+
+        with self._stats_lock:
+            self._stats["hash_count" if fn is _hash_password else "verify_count"] += 1
+            self._stats["hash_seconds_total"] += elapsed
+            self._stats["hash_seconds_max"] = max(self._stats["hash_seconds_max"], elapsed)
+            self._stats["queue_wait_seconds_total"] += max(queue_wait, 0.0)
+            self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], queue_wait)
+        if self.on_complete:
+            self.on_complete("hash" if fn is _hash_password else "verify", elapsed, max(queue_wait, 0.0))
+        return result
+
+    def _release(self, future=None):
+        self._slots.release()
+        with self._stats_lock:
+            self._stats["in_flight"] -= 1
+
+    def hash(self, password):
+        return self._run(_hash_password, password.encode("utf-8"), self.rounds).decode("utf-8")
+
+    def verify(self, password, hashed):
+        return self._run(_check_password, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        count = stats["hash_count"] + stats["verify_count"]
+        stats["rounds"] = self.rounds
+        stats["hash_seconds_avg"] = stats["hash_seconds_total"] / count if count else 0.0
+        stats["queue_wait_seconds_avg"] = stats["queue_wait_seconds_total"] / count if count else 0.0
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
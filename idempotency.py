@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Idempotency-Key support for the write routes. The first request with a key
+# reserves it; once it completes, its status, headers and body are stored for
+# ttl seconds and replayed to retries with the same key and request body.
+#
+# A record is (state, fingerprint, status, headers, body) with state
+# "pending" while the first request runs, then "done".
+
+
+# In-process backend: least recently used keys are dropped beyond max_keys
+class MemoryBackend:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._records = OrderedDict()  # key -> (record, expires_at)
+        self._lock = threading.Lock()
+
+    def _get(self, key, now):
+        entry = self._records.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._records[key]
+            return None
+        return entry and entry[0]
+
+    def reserve(self, key, record, ttl):
+        # -> the existing record, or None after storing record
+        now = time.time()
+        with self._lock:
+            existing = self._get(key, now)
+            if existing is not None:
+                return existing
+            self._records[key] = (record, now + ttl)
+            while len(self._records) > self.max_keys:
+                self._records.popitem(last=False)
+            return None
+
+    def put(self, key, record, ttl):
+        with self._lock:
+            self._records[key] = (record, time.time() + ttl)
+            self._records.move_to_end(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._records)
+
+
+# Shared backend for multi-worker deployments; a reservation is SET NX
+class RedisBackend:
+    def __init__(self, url, prefix="idempotency:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    @staticmethod
+    def _encode(record):
+        state, fingerprint, status, headers, body = record
+        return json.dumps([state, fingerprint, status, headers]).encode("utf-8") + b"\n" + (body or b"")
+
+    @staticmethod
+    def _decode(raw):
+        meta, body = raw.split(b"\n", 1)
+        state, fingerprint, status, headers = json.loads(meta)
+        return state, fingerprint, status, headers, body
+
+    def reserve(self, key, record, ttl):
+        if self._redis.set(self._prefix + key, self._encode(record), nx=True, ex=max(1, int(ttl))):
+            return None
+        raw = self._redis.get(self._prefix + key)
+        # Expired in between: treat as still pending so the client retries
+        return self._decode(raw) if raw is not None else ("pending", record[1], None, None, None)
+
+    def put(self, key, record, ttl):
+        self._redis.set(self._prefix + key, self._encode(record), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._redis.delete(self._prefix + key)
+
+    def size(self):
+        return None
+
+
+class IdempotencyStore:
+    def __init__(self, backend=None, ttl=86400, pending_ttl=60):
+        # pending_ttl bounds how long a crashed request's reservation blocks retries
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+
+    def begin(self, key, fingerprint):
+        # -> ("new", None), ("replay", record), ("in_progress", record) or ("mismatch", record)
+        record = self.backend.reserve(key, ("pending", fingerprint, None, None, None), self.pending_ttl)
+        if record is None:
+            return "new", None
+        if record[1] != fingerprint:
+            return "mismatch", record
+        if record[0] == "pending":
+            return "in_progress", record
+        return "replay", record
+
+    def complete(self, key, fingerprint, status, headers, body):
+        self.backend.put(key, ("done", fingerprint, status, headers, body), self.ttl)
+
+    def abandon(self, key):
+        # The request failed; a retry may run it again
+        self.backend.delete(key)
@@ -0,0 +1,227 @@
+import json
+import queue
+import threading
+import time
+import uuid
+
+# Background jobs for long-running writes: the route answers 202 with the job
+# id and a bounded pool of worker threads runs the job, retrying failures
+# with exponential backoff. Job state lives in a backend (in-process, or
+# Redis so every worker can answer /jobs/<id>); the job itself runs in the
+# process that accepted it.
+#
+# A job function is called as fn(job, *args). It reports progress with
+# job.report(done, total) and returns the result; an exception fails the
+# attempt. A retried job sees the progress of the previous attempts, so
+# work committed in steps can resume where it stopped. Jobs still waiting
+# to retry when the queue shuts down are marked failed.
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.attempts = 0
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.on_change = None
+
+    def report(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self.on_change:
+            self.on_change(self)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "progress": {"done": self.done, "total": self.total},
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# In-process backend: finished jobs are dropped after retention seconds
+class MemoryBackend:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job_dict, retention):
+        expires_at = time.time() + retention if job_dict["finished_at"] else None
+        with self._lock:
+            self._jobs[job_dict["id"]] = (job_dict, expires_at)
+            now = time.time()
+            for job_id in [i for i, (_, expires) in self._jobs.items() if expires is not None and expires <= now]:
+                del self._jobs[job_id]
+
+    def load(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None
+        return entry[0]
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="job:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def save(self, job_dict, retention):
+        # Unfinished jobs also expire eventually, in case their process died
+        ttl = retention if job_dict["finished_at"] else max(retention, 24 * 3600)
+        self._redis.set(self._prefix + job_dict["id"], json.dumps(job_dict), ex=max(1, int(ttl)))
+
+    def load(self, job_id):
+        raw = self._redis.get(self._prefix + job_id)
+        return json.loads(raw) if raw is not None else None
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_queue=100, max_attempts=3, backoff=1.0, retention=3600, backend=None,
+                 context=None):
+        # context() -> a context manager each attempt runs in (e.g. a Flask app context)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retention = retention
+        self.backend = backend or MemoryBackend()
+        self._context = context
+        self._queue = queue.Queue()
+        self._threads = []
+        self._pending = 0  # queued, running or waiting to retry
+        self._retries = {}  # job id -> (timer, job) for jobs waiting to retry
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "retried": 0, "rejected": 0}
+
+    def _start_workers(self):
+        # Started on first use, so importing the app starts no threads
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, fn, *args):
+        job = Job(kind)
+        job.on_change = self._save
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise JobQueueFull("Too many background jobs, please retry later")
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._start_workers()
+        self._save(job)
+        self._queue.put((job, fn, args))
+        return job
+
+    def get(self, job_id):
+        return self.backend.load(job_id)
+
+    def _save(self, job):
+        self.backend.save(job.to_dict(), self.retention)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._run(*item)
+
+    def _run(self, job, fn, args):
+        job.attempts += 1
+        job.status = "running"
+        job.started_at = job.started_at or time.time()
+        job.error = None
+        self._save(job)
+        try:
+            if self._context:
+                with self._context():
+                    job.result = fn(job, *args)
+            else:
+                job.result = fn(job, *args)
+        except Exception as e:
+            job.error = str(e)
+            if job.attempts < self.max_attempts:
+                job.status = "retrying"
+                self._save(job)
+                delay = self.backoff * 2 ** (job.attempts - 1)
+                timer = threading.Timer(delay, self._retry, (job, fn, args))
+                timer.daemon = True
+                with self._lock:
+                    self._stats["retried"] += 1
+                    self._retries[job.id] = (timer, job)
+                timer.start()
+                return
+            self._finish(job, "failed")
+        else:
+            self._finish(job, "succeeded")
+
+    def _retry(self, job, fn, args):
+        with self._lock:
+            # Gone if the queue shut down in the meantime
+            if self._retries.pop(job.id, None) is not None:
+                self._queue.put((job, fn, args))
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        self._save(job)
+        with self._lock:
+            self._pending -= 1
+            self._stats[status] += 1
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        # No worker is left to run the waiting retries, or retries queued
+        # after the workers stopped, so their jobs fail instead of staying
+        # "retrying" forever
+        with self._lock:
+            retries, self._retries = self._retries, {}
+        stranded = []
+        for timer, job in retries.values():
+            timer.cancel()
+            stranded.append(job)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                stranded.append(item[0])
+        for job in stranded:
+            job.error = f"{job.error} (not retried: the job queue shut down)"
+            self._finish(job, "failed")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+            stats["workers"] = len(self._threads)
+        return stats
@@ -0,0 +1,85 @@
+# ?limit=&after= keyset pagination, ?fields= projection and ?column=value
+# filters for the GET list endpoints. Everything is pushed into the SQL.
+
+RESERVED_ARGS = ("limit", "after", "fields", "stream", "format")
+
+
+class ListArgsError(ValueError):
+    pass
+
+
+def _convert(table, column, value):
+    if column not in table.int_columns:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise ListArgsError(f"Invalid value for {column}: {value}")
+
+
+def parse_list_args(table, args, max_limit=None):
+    fields = table.columns
+    if args.get("fields"):
+        fields = tuple(f.strip() for f in args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in table.columns]
+        if unknown or not fields:
+            raise ListArgsError(f"Unknown fields: {', '.join(unknown)}")
+
+    limit = None
+    if args.get("limit"):
+        try:
+            limit = int(args["limit"])
+        except ValueError:
+            raise ListArgsError("limit must be an integer")
+        if limit < 1:
+            raise ListArgsError("limit must be positive")
+        if max_limit:
+            limit = min(limit, max_limit)
+
+    after = None
+    if args.get("after"):
+        after = _convert(table, table.key, args["after"])
+
+    filters = {}
+    for column, value in args.items():
+        if column in RESERVED_ARGS:
+            continue
+        if column not in table.filters:
+            raise ListArgsError(f"Unsupported filter: {column}")
+        filters[column] = _convert(table, column, value)
+
+    return fields, filters, limit, after
+
+
+def build_select(table, fields=None, filters=None, limit=None, after=None):
+    fields = fields or table.columns
+    # The key is always selected so a next cursor can be computed
+    columns = list(fields) if table.key in fields else [table.key] + list(fields)
+
+    conditions = []
+    params = []
+    for column, value in (filters or {}).items():
+        conditions.append(f"{column} = %s")
+        params.append(value)
+    if after is not None:
+        conditions.append(f"{table.key} > %s")
+        params.append(after)
+
+    query = f"SELECT {', '.join(columns)} FROM {table.name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if limit is not None or after is not None:
+        query += f" ORDER BY {table.key}"
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query += " LIMIT %s"
+        params.append(limit + 1)
+
+    return query, tuple(params), tuple(columns)
+
+
+def paginate(rows, columns, limit, key):
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1][columns.index(key)]
@@ -0,0 +1,185 @@
+import argparse
+import sys
+from collections import namedtuple
+
+from availability import select_rows as select_availability_rows
+from listing import build_select
+from schema import TABLES
+from summary import GROUP_BY
+
+# Registry of the fixed SQL statements the write handlers run, so every
+# statement's text is built once, in one place, and can be checked with
+# EXPLAIN against a seeded database (check_plans, or `python queries.py`).
+# Statements whose shape depends on the request (list filters, IN lists) are
+# built by listing.py, summary.py and friends; check_plans covers one of each.
+#
+# MySQLdb has no server-side prepared statements (the binary protocol), so
+# these are sent as text with client-side escaping, one round trip each.
+
+QUERIES = {
+    "insert_manufacturer": """
+        INSERT INTO Car_Manufacturers (manufacturer_ShortName, manufacturer_FullName, manufacturer_OtherDetails)
+        VALUES (%s, %s, %s)
+        """,
+    "update_manufacturer": """
+        UPDATE Car_Manufacturers
+        SET manufacturer_ShortName = %s, manufacturer_FullName = %s, manufacturer_OtherDetails = %s
+        WHERE manufacturer_ID = %s
+        """,
+    "delete_manufacturer": "DELETE FROM Car_Manufacturers WHERE manufacturer_ID = %s",
+    "update_branch": """
+        UPDATE Branches
+        SET branch_other_details = %s, branch_Manager_Code = %s
+        WHERE branch_location = %s
+        """,
+    "delete_branch": "DELETE FROM Branches WHERE branch_location = %s",
+    "update_vehicle": """
+        UPDATE Vehicles
+        SET vehicle_Description = %s, vehicle_OtherDetails = %s
+        WHERE vehicle_ID = %s
+        """,
+    "delete_vehicle": "DELETE FROM Vehicles WHERE vehicle_ID = %s",
+    "insert_inventory": """
+        INSERT INTO Inventory (branch_location, vehicle_ID, inventory_Count)
+        VALUES (%s, %s, %s)
+        """,
+    "update_inventory": """
+        UPDATE Inventory
+        SET inventory_Count = %s
+        WHERE inventory_ID = %s
+        """,
+    "delete_inventory": "DELETE FROM Inventory WHERE inventory_ID = %s",
+    # Counts may go below zero here, which LAST_INSERT_ID() can't hand back
+    # (it is BIGINT UNSIGNED), so the new count is read with inventory_count
+    "adjust_inventory": """
+        UPDATE Inventory
+        SET inventory_Count = inventory_Count + %s
+        WHERE inventory_ID = %s
+        """,
+    # LAST_INSERT_ID(expr) hands the new count back on this connection without a second read
+    "adjust_inventory_guarded": """
+        UPDATE Inventory
+        SET inventory_Count = LAST_INSERT_ID(inventory_Count + %s)
+        WHERE inventory_ID = %s AND inventory_Count + %s >= 0
+        """,
+    "inventory_exists": "SELECT 1 FROM Inventory WHERE inventory_ID = %s",
+    "inventory_count": "SELECT inventory_Count FROM Inventory WHERE inventory_ID = %s",
+}
+
+# Parameters for EXPLAIN; INSERTs have no plan worth checking
+EXPLAIN_PARAMS = {
+    "update_manufacturer": ("M", "Manufacturer", None, 1),
+    "delete_manufacturer": (1,),
+    "update_branch": (None, "MGR", "Branch"),
+    "delete_branch": ("Branch",),
+    "update_vehicle": ("Vehicle", None, 1),
+    "delete_vehicle": (1,),
+    "update_inventory": (1, 1),
+    "delete_inventory": (1,),
+    "adjust_inventory": (1, 1),
+    "adjust_inventory_guarded": (1, 1, 1),
+    "inventory_exists": (1,),
+    "inventory_count": (1,),
+}
+
+SAMPLE_VALUES = {"branch_location": "Branch", "branch_Manager_Code": "MGR", "manufacturer_ShortName": "M"}
+
+# Secondary indexes for the list filters, the summary GROUP BYs and their
+# per-group refreshes, the availability model's reloads and change log pruning.
+# The Inventory ones include inventory_Count so the aggregates are index-only.
+Index = namedtuple("Index", ["name", "table", "columns"])
+
+INDEXES = (
+    Index("idx_inventory_branch", "Inventory", ("branch_location", "inventory_Count")),
+    Index("idx_inventory_vehicle", "Inventory", ("vehicle_ID", "inventory_Count")),
+    Index("idx_vehicles_manufacturer", "Vehicles", ("manufacturer_ID",)),
+    Index("idx_manufacturers_short_name", "Car_Manufacturers", ("manufacturer_ShortName",)),
+    Index("idx_branches_manager", "Branches", ("branch_Manager_Code",)),
+    Index("idx_change_log_changed_at", "Change_Log", ("changed_at",)),
+)
+
+
+def index_ddl(index, if_not_exists=False):
+    # MySQL has no CREATE INDEX IF NOT EXISTS; create_indexes checks first
+    exists = "IF NOT EXISTS " if if_not_exists else ""
+    return f"CREATE INDEX {exists}{index.name} ON {index.table} ({', '.join(index.columns)})"
+
+
+def create_indexes(cursor):
+    # -> names of the indexes created; tables that don't exist are skipped
+    cursor.execute(
+        "SELECT table_name, index_name FROM information_schema.statistics WHERE table_schema = DATABASE()"
+    )
+    existing = {(table, name) for table, name in cursor.fetchall()}
+    cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    created = []
+    for index in INDEXES:
+        if index.table in tables and (index.table, index.name) not in existing:
+            cursor.execute(index_ddl(index))
+            created.append(index.name)
+    return created
+
+
+def plan_checks():
+    # -> [(name, query, params)] for every registered statement and one of
+    # each generated filter: list filters, summary refreshes, availability reloads
+    checks = [(name, QUERIES[name], params) for name, params in EXPLAIN_PARAMS.items()]
+    for resource, table in TABLES.items():
+        for column in table.filters:
+            query, params, _ = build_select(table, None, {column: SAMPLE_VALUES.get(column, 1)}, None, None)
+            checks.append((f"list_{resource}_by_{column}", query, params))
+    for group_by, (column, source) in GROUP_BY.items():
+        query = f"SELECT {column}, COUNT(*), COALESCE(SUM(i.inventory_Count), 0) {source} WHERE {column} = %s GROUP BY {column}"
+        checks.append((f"summary_group_{group_by}", query, (SAMPLE_VALUES.get(group_by, 1),)))
+    for column in ("vehicle_ID", "branch_location"):
+        query, params = select_availability_rows("inventory", column, [SAMPLE_VALUES.get(column, 1)])
+        checks.append((f"availability_inventory_by_{column}", query, params))
+    return checks
+
+
+def check_plans(cursor):
+    # -> ["name: full scan of table"] for each check whose EXPLAIN has a
+    # full table scan (type ALL); run it against a seeded database, as MySQL
+    # scans tiny tables whatever their indexes
+    warnings = []
+    for name, query, params in plan_checks():
+        cursor.execute("EXPLAIN " + " ".join(query.split()), params)
+        columns = [d[0].lower() for d in cursor.description]
+        for row in cursor.fetchall():
+            plan = dict(zip(columns, row))
+            if plan.get("type") == "ALL":
+                warnings.append(f"{name}: full scan of {plan.get('table')}")
+    return warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the API's query plans against the configured MySQL database")
+    parser.add_argument("--create-indexes", action="store_true", help="create the missing secondary indexes first")
+    args = parser.parse_args(argv)
+
+    from flask import Flask
+
+    from config import load_config
+    from db import Database
+
+    app = Flask(__name__)
+    load_config(app)
+    conn = Database(app)._create_pool()._connect()
+    try:
+        cursor = conn.cursor()
+        if args.create_indexes:
+            for name in create_indexes(cursor):
+                print(f"created {name}")
+            conn.commit()
+        warnings = check_plans(cursor)
+    finally:
+        conn.close()
+    for warning in warnings:
+        print(warning)
+    return 1 if warnings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
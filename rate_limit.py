@@ -0,0 +1,144 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Token-bucket rate limiting and per-route-class concurrency caps.
+#
+# A limit such as "10/minute" is a bucket holding at most 10 tokens that
+# refills at 10 per minute; every request takes one. Buckets are keyed by
+# (route class, key type, key), e.g. ("login", "username", "alice").
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(spec):
+    # "10/minute" -> (capacity, tokens per second)
+    try:
+        count, period = spec.split("/")
+        count = int(count)
+        seconds = PERIODS[period.strip().rstrip("s")]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '10/minute'")
+    if count <= 0:
+        raise ValueError(f"Invalid rate limit {spec!r}, count must be positive")
+    return count, count / seconds
+
+
+# In-process buckets: {key: (tokens, updated_at)}, least recently used dropped first
+class MemoryBackend:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        # -> seconds until a token is available (0.0 if one was taken)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def size(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+# Shared buckets for multi-worker deployments; the update is one atomic script
+class RedisBackend:
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+    redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix="rate_limit:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key, capacity, rate):
+        return float(self._script(keys=[self._prefix + ":".join(key)], args=[capacity, rate, time.time()]))
+
+    def size(self):
+        return None
+
+
+class RateLimiter:
+    def __init__(self, limits, backend=None):
+        # limits: {route_class: {key_type: "N/period"}}
+        self.backend = backend or MemoryBackend()
+        self.limits = {
+            route_class: {key_type: parse_limit(spec) for key_type, spec in rules.items()}
+            for route_class, rules in limits.items()
+        }
+
+    def check(self, route_class, keys):
+        # keys: {key_type: value}; key types without a value are skipped.
+        # -> (key_type, retry_after_seconds) for the first exhausted bucket, or None
+        for key_type, (capacity, rate) in self.limits.get(route_class, {}).items():
+            value = keys.get(key_type)
+            if value is None:
+                continue
+            wait = self.backend.take((route_class, key_type, str(value)), capacity, rate)
+            if wait > 0:
+                return key_type, max(1, math.ceil(wait))
+        return None
+
+
+# Caps how many requests of each route class run at once; the rest are
+# rejected after at most `wait` seconds instead of queueing without bound.
+class ConcurrencyLimiter:
+    def __init__(self, limits, wait=0.0):
+        self.limits = dict(limits)
+        self.wait = wait
+        self._slots = {route_class: threading.BoundedSemaphore(n) for route_class, n in self.limits.items() if n}
+        self._in_flight = {route_class: 0 for route_class in self._slots}
+        self._lock = threading.Lock()
+
+    def acquire(self, route_class):
+        slots = self._slots.get(route_class)
+        if slots is None:
+            return True
+        acquired = slots.acquire(timeout=self.wait) if self.wait else slots.acquire(blocking=False)
+        if not acquired:
+            return False
+        with self._lock:
+            self._in_flight[route_class] += 1
+        return True
+
+    def release(self, route_class):
+        slots = self._slots.get(route_class)
+        if slots is None:
+            return
+        with self._lock:
+            self._in_flight[route_class] -= 1
+        slots.release()
+
+    def in_flight(self):
+        with self._lock:
+            return dict(self._in_flight)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+# Holder for an in-memory structure derived from the database, such as the
+# search index. It is loaded on first use and patched by the write handlers
+# after they commit. Every `refresh` seconds it is reloaded to pick up writes
+# made by other workers; requests keep using the old copy meanwhile, and the
+# changes committed during the load are replayed onto the new one.
+#
+# A change's rows are read outside the lock, so writers don't queue behind
+# each other's SELECTs. If another patch landed meanwhile, the rows may be
+# older than it, so they are read again under the lock.
+
+
+class ReadModel:
+    def __init__(self, resources, load, fetch, patch):
+        # load() -> a new model; fetch(resource, op, keys) -> the rows of keys
+        # after op ("insert", "update" or "delete") changed them, and
+        # patch(model, resource, op, keys, rows) puts them in the model
+        self.resources = frozenset(resources)
+        self.current = None
+        self.loaded_at = None
+        self._load = load
+        self._fetch = fetch
+        self._patch = patch
+        self._load_lock = threading.Lock()
+        self._updates = None
+        self._updates_lock = threading.Lock()
+        self._version = 0  # bumped by every patch and reload
+
+    def get(self, refresh=0):
+        model = self.current
+        if model is not None and not (refresh and time.monotonic() - self.loaded_at > refresh):
+            return model
+        # The first caller loads and the others wait; a refresh happens in one
+        # request while the rest are answered from the old copy
+        if not self._load_lock.acquire(blocking=model is None):
+            return model
+        try:
+            if self.current is not model:
+                return self.current
+            with self._updates_lock:
+                self._updates = []
+            started = time.monotonic()
+            try:
+                loaded = self._load()
+            except Exception:
+                with self._updates_lock:
+                    self._updates = None
+                raise
+            with self._updates_lock:
+                for resource, op, keys in self._updates:
+                    self._patch(loaded, resource, op, keys, self._fetch(resource, op, keys))
+                self.current, self.loaded_at, self._updates = loaded, started, None
+                self._version += 1
+            return loaded
+        finally:
+            self._load_lock.release()
+
+    def changed(self, resource, op, keys):
+        if resource not in self.resources:
+            return
+        with self._updates_lock:
+            version = self._version
+            if self.current is None and self._updates is None:
+                return
+        rows = self._fetch(resource, op, keys)
+        with self._updates_lock:
+            if self._version != version:
+                rows = self._fetch(resource, op, keys)
+            if self._updates is not None:
+                self._updates.append((resource, op, keys))
+            if self.current is not None:
+                self._patch(self.current, resource, op, keys, rows)
+            self._version += 1
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+import time
+
+
+# In-process backend: {resource: {key: (body, etag, created_at)}}
+class MemoryBackend:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, resource, key):
+        with self._lock:
+            return self._data.get(resource, {}).get(key)
+
+    def set(self, resource, key, entry):
+        with self._lock:
+            self._data.setdefault(resource, {})[key] = entry
+
+    def clear(self, resource):
+        with self._lock:
+            self._data.pop(resource, None)
+
+    def size(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._data.values())
+
+
+# Shared backend for multi-worker deployments; one Redis hash per resource
+class RedisBackend:
+    def __init__(self, url, prefix="response_cache:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, resource, key):
+        raw = self._redis.hget(self._prefix + resource, key)
+        if raw is None:
+            return None
+        meta, body = raw.split(b"\n", 1)
+        etag, created_at = json.loads(meta)
+        return body, etag, created_at
+
+    def set(self, resource, key, entry):
+        body, etag, created_at = entry
+        meta = json.dumps([etag, created_at]).encode("utf-8")
+        self._redis.hset(self._prefix + resource, key, meta + b"\n" + body)
+
+    def clear(self, resource):
+        self._redis.delete(self._prefix + resource)
+
+    def size(self):
+        return None
+
+
+# Read-through cache of serialised responses. Entries are dropped when a write
+# handler invalidates their resource, or after ttl seconds as a safety net for
+# writes made by other workers with an in-process backend.
+class ResponseCache:
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "not_modified": 0, "served_age_seconds_max": 0.0}
+        self._invalidated_at = {}
+        self._generations = {}
+
+    @staticmethod
+    def make_etag(body):
+        return hashlib.sha1(body).hexdigest()
+
+    def get(self, resource, key):
+        entry = self.backend.get(resource, key)
+        now = time.time()
+        if entry is not None and now - entry[2] >= self.ttl:
+            entry = None
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+                self._stats["served_age_seconds_max"] = max(self._stats["served_age_seconds_max"], now - entry[2])
+        return entry
+
+    def generation(self, resource):
+        with self._lock:
+            return self._generations.get(resource, 0)
+
+    def set(self, resource, key, body, generation=None):
+        entry = (body, self.make_etag(body), time.time())
+        # Don't store a body that was read before a concurrent invalidation
+        if generation is None or generation == self.generation(resource):
+            self.backend.set(resource, key, entry)
+        return entry
+
+    def invalidate(self, resource):
+        with self._lock:
+            self._generations[resource] = self._generations.get(resource, 0) + 1
+            self._stats["invalidations"] += 1
+            self._invalidated_at[resource] = time.time()
+        self.backend.clear(resource)
+
+    def record_not_modified(self):
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["invalidated_at"] = dict(self._invalidated_at)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = self.backend.size()
+        stats["ttl"] = self.ttl
+        return stats
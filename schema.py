@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+# Column layout of the car_dealership tables, in SELECT * order.
+# key is the primary key used for keyset pagination; filters are the columns
+# that may be used as ?column=value equality filters on the list endpoints.
+Table = namedtuple("Table", ["name", "key", "columns", "int_columns", "filters"])
+
+MANUFACTURERS = Table(
+    name="Car_Manufacturers",
+    key="manufacturer_ID",
+    columns=("manufacturer_ID", "manufacturer_ShortName", "manufacturer_FullName", "manufacturer_OtherDetails"),
+    int_columns=("manufacturer_ID",),
+    filters=("manufacturer_ID", "manufacturer_ShortName"),
+)
+
+BRANCHES = Table(
+    name="Branches",
+    key="branch_location",
+    columns=("branch_location", "branch_other_details", "branch_Manager_Code"),
+    int_columns=(),
+    filters=("branch_location", "branch_Manager_Code"),
+)
+
+VEHICLES = Table(
+    name="Vehicles",
+    key="vehicle_ID",
+    columns=("vehicle_ID", "manufacturer_ID", "vehicle_Description", "vehicle_OtherDetails"),
+    int_columns=("vehicle_ID", "manufacturer_ID"),
+    filters=("vehicle_ID", "manufacturer_ID"),
+)
+
+INVENTORY = Table(
+    name="Inventory",
+    key="inventory_ID",
+    columns=("inventory_ID", "branch_location", "vehicle_ID", "inventory_Count"),
+    int_columns=("inventory_ID", "vehicle_ID", "inventory_Count"),
+    filters=("inventory_ID", "branch_location", "vehicle_ID"),
+)
+
+TABLES = {
+    "manufacturers": MANUFACTURERS,
+    "branches": BRANCHES,
+    "vehicles": VEHICLES,
+    "inventory": INVENTORY,
+}
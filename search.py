@@ -0,0 +1,179 @@
+import bisect
+import heapq
+import re
+import threading
+from collections import namedtuple
+
+from schema import MANUFACTURERS, VEHICLES
+
+# In-process inverted index for type-ahead search over manufacturer names and
+# vehicle descriptions. Every query token matches indexed words it is a prefix
+# of, so "toy cor" finds "Toyota Corolla", and a result has to match all the
+# tokens. A token scores the weight of the field it matched in, halved for a
+# prefix match; ties go to shorter documents.
+
+Searchable = namedtuple("Searchable", ["table", "columns", "weights"])
+
+SEARCHABLE = {
+    "manufacturers": Searchable(
+        MANUFACTURERS,
+        ("manufacturer_ID", "manufacturer_ShortName", "manufacturer_FullName"),
+        {"manufacturer_ShortName": 3.0, "manufacturer_FullName": 2.0},
+    ),
+    "vehicles": Searchable(
+        VEHICLES,
+        ("vehicle_ID", "manufacturer_ID", "vehicle_Description"),
+        {"vehicle_Description": 1.0},
+    ),
+}
+
+PREFIX_FACTOR = 0.5
+MAX_QUERY_TOKENS = 8
+WORD = re.compile(r"\w+")
+
+
+class SearchArgsError(ValueError):
+    pass
+
+
+def tokenize(text):
+    return WORD.findall(text.lower()) if text else []
+
+
+def parse_search_args(args, max_limit, default_limit):
+    query = args.get("q", "")
+    if not tokenize(query):
+        raise SearchArgsError("q must contain at least one letter or digit")
+
+    tables = [t for t in args.get("tables", "").split(",") if t]
+    unknown = [t for t in tables if t not in SEARCHABLE]
+    if unknown:
+        raise SearchArgsError(f"Unknown tables: {', '.join(unknown)}; searchable: {', '.join(SEARCHABLE)}")
+
+    try:
+        limit = int(args["limit"]) if args.get("limit") else default_limit
+        after = int(args["after"]) if args.get("after") else 0
+    except ValueError:
+        raise SearchArgsError("limit and after must be integers")
+    if limit < 1 or after < 0:
+        raise SearchArgsError("limit must be positive and after must not be negative")
+    return query, tuple(tables or SEARCHABLE), min(limit, max_limit), after
+
+
+def select_rows(resource, column=None, values=None):
+    # -> (query, params) for the indexed columns of every row, or of the rows whose column is in values
+    searchable = SEARCHABLE[resource]
+    query = f"SELECT {', '.join(searchable.columns)} FROM {searchable.table.name}"
+    if column is None:
+        return query, ()
+    values = sorted(set(values))
+    return query + f" WHERE {column} IN ({', '.join(['%s'] * len(values))})", values
+
+
+class SearchIndex:
+    def __init__(self):
+        self._docs = {}  # (resource, key) -> (row dict, word count, {word: weight})
+        self._postings = {}  # word -> {(resource, key): weight}
+        self._words = []  # sorted, for prefix ranges
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, resource, values, sort=True):
+        searchable = SEARCHABLE[resource]
+        row = dict(zip(searchable.columns, values))
+        doc = (resource, row[searchable.table.key])
+        self._remove(doc)
+
+        weights, count = {}, 0
+        for column, weight in searchable.weights.items():
+            words = tokenize(row[column])
+            count += len(words)
+            for word in words:
+                weights[word] = max(weights.get(word, 0.0), weight)
+        self._docs[doc] = (row, count, weights)
+        for word, weight in weights.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                if sort:
+                    bisect.insort(self._words, word)
+            postings[doc] = weight
+
+    def _remove(self, doc):
+        entry = self._docs.pop(doc, None)
+        if entry is None:
+            return
+        for word in entry[2]:
+            postings = self._postings[word]
+            del postings[doc]
+            if not postings:
+                del self._postings[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+
+    def add_rows(self, resource, rows):
+        # Bulk load: the word list is sorted once at the end
+        with self._lock:
+            for row in rows:
+                self._add(resource, row, sort=False)
+            self._words = sorted(self._postings)
+
+    def replace(self, resource, keys, rows):
+        # rows are the current versions of keys; keys without a row were deleted
+        with self._lock:
+            for key in keys:
+                self._remove((resource, key))
+            for row in rows:
+                self._add(resource, row)
+
+    def _range(self, token):
+        # Indexes into self._words of the words starting with token
+        start = bisect.bisect_left(self._words, token)
+        return start, bisect.bisect_left(self._words, token + "\U0010ffff", start)
+
+    def _matches(self, token, tables):
+        # {doc: best weight} over every indexed word starting with token
+        matches = {}
+        every_table = len(tables) == len(SEARCHABLE)
+        start, end = self._range(token)
+        for word in self._words[start:end]:
+            factor = 1.0 if word == token else PREFIX_FACTOR
+            postings = self._postings[word]
+            if not matches:
+                matches = {doc: weight * factor for doc, weight in postings.items() if every_table or doc[0] in tables}
+                continue
+            for doc, weight in postings.items():
+                if (every_table or doc[0] in tables) and weight * factor > matches.get(doc, 0.0):
+                    matches[doc] = weight * factor
+        return matches
+
+    def _doc_score(self, doc, token):
+        weights = self._docs[doc][2]
+        return max(
+            (weight * (1.0 if word == token else PREFIX_FACTOR) for word, weight in weights.items() if word.startswith(token)),
+            default=0.0,
+        )
+
+    def _selectivity(self, token):
+        start, end = self._range(token)
+        return sum(len(self._postings[word]) for word in self._words[start:end])
+
+    def search(self, query, tables, limit, offset=0):
+        # -> (results ranked by score, whether there are more)
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+        with self._lock:
+            # Candidates come from the rarest token; the others are checked per candidate
+            tokens.sort(key=self._selectivity)
+            scores = self._matches(tokens[0], tables)
+            for token in tokens[1:]:
+                scores = {doc: score + extra for doc, score in scores.items() if (extra := self._doc_score(doc, token))}
+            if not scores:
+                return [], False
+            docs = self._docs
+            ranked = heapq.nsmallest(offset + limit + 1, [(-score, docs[doc][1], doc) for doc, score in scores.items()])
+            results = [
+                {"table": doc[0], "key": doc[1], "score": round(-score, 3), "row": docs[doc][0]}
+                for score, _, doc in ranked[offset:offset + limit]
+            ]
+        return results, len(ranked) > offset + limit
@@ -0,0 +1,161 @@
+import datetime
+import decimal
+import json
+
+# Row-to-JSON encoding for the list endpoints, driven by the column names in
+# schema.py. Uses orjson or ujson when installed and falls back to the stdlib.
+# All three encoders produce the same bytes (compact, sorted keys, non-ASCII
+# as raw UTF-8) so ETags and contracts don't depend on which one is present.
+#
+# Two layouts are offered:
+#   objects:  [{"col": value, ...}, ...]                 (the default)
+#   columnar: {"columns": [...], "rows": [[...], ...]}  (?format=columnar)
+#
+# The same structures can be encoded as MessagePack or CBOR for clients that
+# ask for them (see BINARY_MIMETYPES), when msgpack or cbor2 is installed.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+ENCODER = "orjson" if orjson else "ujson" if ujson else "json"
+
+# Accepted media types per binary format; responses use the one asked for
+BINARY_MIMETYPES = {
+    "msgpack": ("application/msgpack", "application/vnd.msgpack", "application/x-msgpack"),
+    "cbor": ("application/cbor",),
+}
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson:
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS)
+elif ujson:
+    def dumps(obj):
+        return ujson.dumps(obj, sort_keys=True, ensure_ascii=False, default=_default).encode("utf-8")
+else:
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"), sort_keys=True, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def binary_formats():
+    installed = {"msgpack": msgpack is not None, "cbor": cbor2 is not None}
+    return tuple(f for f in BINARY_MIMETYPES if installed[f])
+
+
+def packb(obj, fmt):
+    # Types the format has no encoding for (decimals and dates in msgpack) are
+    # converted as for JSON
+    if fmt == "msgpack":
+        return msgpack.packb(obj, default=_default)
+    return cbor2.dumps(obj, default=lambda encoder, value: encoder.encode(_default(value)))
+
+
+_encode_string = json.encoder.encode_basestring
+
+
+def _encode_value(value):
+    kind = type(value)
+    if kind is int:
+        return str(value)
+    if kind is str:
+        return _encode_string(value)
+    if kind is float:
+        return repr(value)
+    if value is None:
+        return "null"
+    return dumps(value).decode("utf-8")
+
+
+def _projection(columns, fields):
+    # (index, key) pairs for the requested fields, in sorted key order
+    fields = fields or columns
+    return sorted(((columns.index(f), f) for f in fields), key=lambda p: p[1])
+
+
+def _objects_template(columns, fields):
+    # Stdlib fallback: splice pre-encoded keys and values, no per-row dicts
+    projection = _projection(columns, fields)
+    indexes = [index for index, _ in projection]
+    keys = [("{" if i == 0 else ",") + _encode_string(key) + ":" for i, (_, key) in enumerate(projection)]
+
+    def encode_row(row):
+        return "".join([key + _encode_value(row[index]) for key, index in zip(keys, indexes)]) + "}"
+
+    return encode_row
+
+
+def encode_objects(rows, columns, fields=None):
+    if orjson or ujson:
+        projection = _projection(columns, fields)
+        return dumps([{key: row[index] for index, key in projection} for row in rows])
+    encode_row = _objects_template(columns, fields)
+    return ("[" + ",".join([encode_row(row) for row in rows]) + "]").encode("utf-8")
+
+
+def encode_object_lines(rows, columns, fields=None):
+    # NDJSON: one object per line
+    if orjson or ujson:
+        projection = _projection(columns, fields)
+        return b"".join([dumps({key: row[index] for index, key in projection}) + b"\n" for row in rows])
+    encode_row = _objects_template(columns, fields)
+    return "".join([encode_row(row) + "\n" for row in rows]).encode("utf-8")
+
+
+def encode_columnar(rows, columns, fields=None, fmt="json"):
+    fields = list(fields or columns)
+    if list(columns) != fields:
+        indexes = [columns.index(f) for f in fields]
+        rows = [[row[i] for i in indexes] for row in rows]
+    if fmt != "json":
+        return packb({"columns": fields, "rows": rows}, fmt)
+    return dumps({"columns": fields, "rows": rows})
+
+
+LAYOUTS = ("objects", "columnar")
+
+
+def encode_rows(rows, columns, fields=None, layout="objects", fmt="json"):
+    if layout == "columnar":
+        return encode_columnar(rows, columns, fields, fmt)
+    if fmt != "json":
+        projection = _projection(columns, fields)
+        return packb([{key: row[index] for index, key in projection} for row in rows], fmt)
+    return encode_objects(rows, columns, fields)
+
+
+# Two-entry map headers, so a page is spliced around encoded data like the JSON one
+PAGE_HEADERS = {"msgpack": b"\x82", "cbor": b"\xa2"}
+
+
+def encode_page(data, next_cursor, fmt="json"):
+    # {"data": ..., "next_cursor": ...} around already encoded data; keys are in sorted order
+    if fmt != "json":
+        return PAGE_HEADERS[fmt] + packb("data", fmt) + data + packb("next_cursor", fmt) + packb(next_cursor, fmt)
+    return b'{"data":' + data + b',"next_cursor":' + dumps(next_cursor) + b"}"
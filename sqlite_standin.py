@@ -0,0 +1,210 @@
+import re
+import sqlite3
+
+from queries import INDEXES, index_ddl
+
+# SQLite stand-in for MySQLdb, used by the benchmark and local tests when no
+# MySQL server is available. It speaks just enough of the MySQLdb connection
+# and cursor API for api.py, translating the MySQL-specific bits of its SQL:
+# %s placeholders, SELECT ... FOR UPDATE, LAST_INSERT_ID(expr) and EXPLAIN
+# (answered from EXPLAIN QUERY PLAN in the table/type/key shape of MySQL's).
+# SHOW REPLICA STATUS reports no lag, so a connection to the same file can
+# stand in for a replica, and the auto-increment settings report consecutive
+# ids, which SQLite's single writer guarantees for a multi-row INSERT.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Car_Manufacturers (
+    manufacturer_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    manufacturer_ShortName VARCHAR(50) NOT NULL,
+    manufacturer_FullName VARCHAR(255) NOT NULL,
+    manufacturer_OtherDetails TEXT
+);
+CREATE TABLE IF NOT EXISTS Branches (
+    branch_location VARCHAR(255) PRIMARY KEY,
+    branch_other_details TEXT,
+    branch_Manager_Code VARCHAR(50)
+);
+CREATE TABLE IF NOT EXISTS Vehicles (
+    vehicle_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    manufacturer_ID INTEGER,
+    vehicle_Description VARCHAR(255),
+    vehicle_OtherDetails TEXT
+);
+CREATE TABLE IF NOT EXISTS Inventory (
+    inventory_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_location VARCHAR(255),
+    vehicle_ID INTEGER,
+    inventory_Count INTEGER
+);
+CREATE TABLE IF NOT EXISTS Change_Log (
+    seq INTEGER PRIMARY KEY,
+    table_name VARCHAR(32) NOT NULL,
+    op VARCHAR(8) NOT NULL,
+    row_key VARCHAR(255) NOT NULL,
+    changed_at DOUBLE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS Change_Log_Seq (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO Change_Log_Seq (id, seq) VALUES (1, 0);
+""" + "".join(index_ddl(index, if_not_exists=True) + ";\n" for index in INDEXES)
+
+FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+EXPLAIN = re.compile(r"^\s*EXPLAIN\s+", re.IGNORECASE)
+PLAN_DETAIL = re.compile(r"^(SCAN|SEARCH) (\S+)(?: USING (?:COVERING )?INDEX (\S+))?")
+EXPLAIN_COLUMNS = (("table",), ("type",), ("key",))
+REPLICA_STATUS = re.compile(r"^\s*SHOW\s+REPLICA\s+STATUS\s*$", re.IGNORECASE)
+REPLICA_STATUS_COLUMNS = (("Seconds_Behind_Source",),)
+AUTOINC_SETTINGS = re.compile(r"^\s*SELECT\s+@@innodb_autoinc_lock_mode,\s*@@auto_increment_increment\s*$", re.IGNORECASE)
+AUTOINC_SETTINGS_COLUMNS = (("@@innodb_autoinc_lock_mode",), ("@@auto_increment_increment",))
+
+
+def plan_row(detail):
+    # SCAN without an index is a full table scan, MySQL's type ALL
+    match = PLAN_DETAIL.match(detail)
+    if match is None:
+        return None
+    operation, table, key = match.groups()
+    if "PRIMARY KEY" in detail:
+        key = "PRIMARY"
+    if operation == "SCAN":
+        return table, "ALL" if key is None else "index", key
+    return table, "ref", key
+
+
+def translate(query):
+    return FOR_UPDATE.sub("", query).replace("%s", "?")
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = self._sqlite_cursor = connection._conn.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    def execute(self, query, args=None):
+        self.connection.last_insert_id = None
+        self._cursor = self._sqlite_cursor
+        if EXPLAIN.match(query):
+            return self._explain(EXPLAIN.sub("", query), args)
+        if REPLICA_STATUS.match(query):
+            return self._rows([(0,)], REPLICA_STATUS_COLUMNS)
+        if AUTOINC_SETTINGS.match(query):
+            return self._rows([(1, 1)], AUTOINC_SETTINGS_COLUMNS)
+        # SQLite has no row locks: take the write lock up front instead, so two
+        # locking readers can't deadlock when they both go on to write
+        if FOR_UPDATE.search(query) and not self.connection._conn.in_transaction:
+            self.connection._conn.execute("BEGIN IMMEDIATE")
+        self._cursor.execute(translate(query), tuple(args or ()))
+        self.rowcount = self._cursor.rowcount
+        self.description = self._cursor.description
+        if self.connection.last_insert_id is not None:
+            self.lastrowid = self.connection.last_insert_id
+        elif query.lstrip().upper().startswith("INSERT") and self.rowcount > 1:
+            # Like MySQL, report the first id of a multi-row insert
+            self.lastrowid = self._cursor.lastrowid - self.rowcount + 1
+        else:
+            self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def _explain(self, query, args):
+        plan = self.connection._conn.execute("EXPLAIN QUERY PLAN " + translate(query), tuple(args or ())).fetchall()
+        rows = [row for row in (plan_row(detail) for _, _, _, detail in plan) if row is not None]
+        return self._rows(rows, EXPLAIN_COLUMNS)
+
+    def _rows(self, rows, description):
+        self._cursor = _Rows(rows)
+        self.rowcount = len(rows)
+        self.description = description
+        return self.rowcount
+
+    def executemany(self, query, args):
+        self._cursor = self._sqlite_cursor
+        self._cursor.executemany(translate(query), [tuple(a) for a in args])
+        self.rowcount = self._cursor.rowcount
+        # Like MySQL, report the first id of a multi-row insert
+        self.lastrowid = None
+        if query.lstrip().upper().startswith("INSERT") and self.rowcount > 0:
+            last = self.connection._conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self.lastrowid = last - self.rowcount + 1
+        return self.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return tuple(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return tuple(self._cursor.fetchall())
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._sqlite_cursor.close()
+
+
+# Stands in for a sqlite3 cursor over rows computed in Python
+class _Rows:
+    def __init__(self, rows):
+        self._rows = list(rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self.last_insert_id = None
+        self._conn.create_function("LAST_INSERT_ID", 1, self._last_insert_id)
+
+    def _last_insert_id(self, value):
+        self.last_insert_id = value
+        return value
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path):
+    return Connection(path)
+
+
+def create_schema(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.commit()
+    conn.close()
@@ -0,0 +1,48 @@
+from serializer import encode_object_lines, encode_objects
+
+# Full-table exports: rows are pulled from a server-side cursor in batches
+# and written out as they arrive, so memory stays flat regardless of table size.
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_stream(request):
+    if request.args.get("stream") in ("1", "true"):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_format(request):
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return "ndjson"
+    return "json"
+
+
+def iter_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def encode_batch(rows, columns, fields, fmt, first):
+    if fmt == "json":
+        # Strip the brackets so batches join into one array
+        chunk = encode_objects(rows, columns, fields)[1:-1]
+        return chunk if first else b"," + chunk
+    return encode_object_lines(rows, columns, fields)
+
+
+def stream_rows(cursor, columns, fields, batch_size, fmt="ndjson"):
+    first = True
+    try:
+        if fmt == "json":
+            yield b"["
+        for rows in iter_batches(cursor, batch_size):
+            yield encode_batch(rows, columns, fields, fmt, first)
+            first = False
+        if fmt == "json":
+            yield b"]"
+    finally:
+        cursor.close()
@@ -0,0 +1,149 @@
+# Inventory aggregates computed in MySQL, either live (GROUP BY/JOIN per
+# request) or from the Inventory_Summary table, which the inventory write
+# handlers, and the deletes that cascade to inventory, keep current by
+# recomputing only the groups a write touched.
+
+GROUP_BY = {
+    "branch_location": ("i.branch_location", "FROM Inventory i"),
+    "vehicle_ID": ("i.vehicle_ID", "FROM Inventory i"),
+    "manufacturer_ID": ("v.manufacturer_ID", "FROM Inventory i JOIN Vehicles v ON v.vehicle_ID = i.vehicle_ID"),
+}
+
+INT_GROUPS = ("vehicle_ID", "manufacturer_ID")
+
+# Deleting one of these cascades to the inventory rows matching the column
+CASCADES = {
+    "manufacturers": "v.manufacturer_ID",
+    "branches": "i.branch_location",
+    "vehicles": "i.vehicle_ID",
+}
+
+SUMMARY_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS Inventory_Summary (
+    group_by VARCHAR(32) NOT NULL,
+    group_key VARCHAR(255) NOT NULL,
+    item_count INT NOT NULL,
+    total_count BIGINT NOT NULL,
+    PRIMARY KEY (group_by, group_key)
+)
+"""
+
+
+def live_query(group_by):
+    column, source = GROUP_BY[group_by]
+    return f"""
+    SELECT {column}, COUNT(*), COALESCE(SUM(i.inventory_Count), 0)
+    {source}
+    GROUP BY {column}
+    ORDER BY {column}
+    """
+
+
+def materialized_query():
+    return """
+    SELECT group_key, item_count, total_count
+    FROM Inventory_Summary
+    WHERE group_by = %s
+    ORDER BY group_key
+    """
+
+
+def to_dicts(group_by, rows):
+    convert = int if group_by in INT_GROUPS else str
+    results = [
+        {group_by: convert(key) if key is not None else None, "items": int(items), "total_count": int(total)}
+        for key, items, total in rows
+    ]
+    # Inventory_Summary stores keys as strings, so restore numeric order
+    results.sort(key=lambda r: (r[group_by] is None, r[group_by]))
+    return results
+
+
+def _groups_from_rows(rows):
+    groups = set()
+    for branch_location, vehicle_ID, manufacturer_ID in rows:
+        groups.add(("branch_location", branch_location))
+        groups.add(("vehicle_ID", vehicle_ID))
+        if manufacturer_ID is not None:
+            groups.add(("manufacturer_ID", manufacturer_ID))
+    return groups
+
+
+def groups_for_inventory(cursor, inventory_IDs):
+    inventory_IDs = list(set(inventory_IDs))
+    if not inventory_IDs:
+        return set()
+    placeholders = ", ".join(["%s"] * len(inventory_IDs))
+    cursor.execute(
+        f"""
+        SELECT i.branch_location, i.vehicle_ID, v.manufacturer_ID
+        FROM Inventory i LEFT JOIN Vehicles v ON v.vehicle_ID = i.vehicle_ID
+        WHERE i.inventory_ID IN ({placeholders})
+        """,
+        inventory_IDs,
+    )
+    return _groups_from_rows(cursor.fetchall())
+
+
+def groups_for_cascade(cursor, resource, key):
+    # Groups of the inventory that deleting this manufacturer, branch or vehicle removes
+    cursor.execute(
+        f"""
+        SELECT i.branch_location, i.vehicle_ID, v.manufacturer_ID
+        FROM Inventory i LEFT JOIN Vehicles v ON v.vehicle_ID = i.vehicle_ID
+        WHERE {CASCADES[resource]} = %s
+        """,
+        (key,),
+    )
+    return _groups_from_rows(cursor.fetchall())
+
+
+def groups_for_items(cursor, items):
+    # New inventory rows: branch and vehicle are known, the manufacturer is looked up
+    pairs = {(item["branch_location"], item["vehicle_ID"]) for item in items}
+    vehicle_IDs = list({vehicle_ID for _, vehicle_ID in pairs})
+    if not vehicle_IDs:
+        return set()
+    placeholders = ", ".join(["%s"] * len(vehicle_IDs))
+    cursor.execute(f"SELECT vehicle_ID, manufacturer_ID FROM Vehicles WHERE vehicle_ID IN ({placeholders})", vehicle_IDs)
+    manufacturers = dict(cursor.fetchall())
+    return _groups_from_rows((branch, vehicle, manufacturers.get(vehicle)) for branch, vehicle in pairs)
+
+
+def refresh_groups(cursor, groups):
+    for group_by, key in sorted(groups, key=lambda g: (g[0], str(g[1]))):
+        column, source = GROUP_BY[group_by]
+        cursor.execute("DELETE FROM Inventory_Summary WHERE group_by = %s AND group_key = %s", (group_by, str(key)))
+        cursor.execute(
+            f"""
+            INSERT INTO Inventory_Summary (group_by, group_key, item_count, total_count)
+            SELECT %s, {column}, COUNT(*), COALESCE(SUM(i.inventory_Count), 0)
+            {source}
+            WHERE {column} = %s
+            GROUP BY {column}
+            """,
+            (group_by, key),
+        )
+
+
+def ensure_table(cursor):
+    # Creates the table, and fills it when empty, so writes can refresh it
+    cursor.execute(SUMMARY_TABLE_DDL)
+    cursor.execute("SELECT 1 FROM Inventory_Summary LIMIT 1")
+    if cursor.fetchone() is None:
+        rebuild(cursor)
+
+
+def rebuild(cursor):
+    cursor.execute(SUMMARY_TABLE_DDL)
+    cursor.execute("DELETE FROM Inventory_Summary")
+    for group_by, (column, source) in GROUP_BY.items():
+        cursor.execute(
+            f"""
+            INSERT INTO Inventory_Summary (group_by, group_key, item_count, total_count)
+            SELECT %s, {column}, COUNT(*), COALESCE(SUM(i.inventory_Count), 0)
+            {source}
+            GROUP BY {column}
+            """,
+            (group_by,),
+        )
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# LRU/TTL cache of decoded JWTs keyed by the token digest. An entry never
+# outlives the token's own "exp" claim. Revoked tokens are remembered until
+# they would have expired anyway.
+class TokenCache:
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                current_user, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return current_user
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, current_user, exp=None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (current_user, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+    def revoke(self, token, exp=None):
+        key = self._key(token)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._revoked[key] = exp if exp is not None else time.time() + self.ttl
+            now = time.time()
+            for revoked_key in [k for k, until in self._revoked.items() if until <= now]:
+                del self._revoked[revoked_key]
+
+    def is_revoked(self, token):
+        with self._lock:
+            until = self._revoked.get(self._key(token))
+        return until is not None and until > time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "revoked": len(self._revoked),
+            }
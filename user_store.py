@@ -0,0 +1,123 @@
+import json
+import sqlite3
+import threading
+
+
+# SQLite-backed user store with an in-memory username -> record index.
+# Writes go through a single INSERT, so concurrent registrations (threads or
+# worker processes sharing the same file) cannot overwrite each other.
+class UserStore:
+    def __init__(self, path="users.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL
+            )
+            """
+        )
+        self._index = {}
+        with self._lock:
+            for username, password, role in self._conn.execute("SELECT username, password, role FROM users"):
+                self._index[username] = {"username": username, "password": password, "role": role}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def get(self, username):
+        user = self._index.get(username)
+        if user is not None:
+            return user
+
+        # Another worker process may have registered the user after we loaded the index
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT username, password, role FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                return None
+            user = {"username": row[0], "password": row[1], "role": row[2]}
+            self._index[username] = user
+            return user
+
+    def add(self, username, password, role):
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                    (username, password, role),
+                )
+            except sqlite3.IntegrityError:
+                return False
+            self._index[username] = {"username": username, "password": password, "role": role}
+            return True
+
+    def update_password(self, username, password):
+        with self._lock:
+            cursor = self._conn.execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+            if cursor.rowcount == 0:
+                return False
+            user = self._index.get(username)
+            if user is not None:
+                self._index[username] = dict(user, password=password)
+            return True
+
+    # Legacy users.json format: {"users": [{"username": ..., "password": ..., "role": ...}]}
+    def import_json(self, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        imported = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user in data.get("users", []):
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)",
+                        (user["username"], user["password"], user["role"]),
+                    )
+                    if cursor.rowcount:
+                        self._index[user["username"]] = {
+                            "username": user["username"],
+                            "password": user["password"],
+                            "role": user["role"],
+                        }
+                        imported += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return imported
+
+    def export_json(self, path):
+        with self._lock:
+            rows = self._conn.execute("SELECT username, password, role FROM users ORDER BY username").fetchall()
+        with open(path, "w") as f:
+            json.dump({"users": [{"username": u, "password": p, "role": r} for u, p, r in rows]}, f)
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print("usage: python user_store.py import|export <users.json> <users.db>")
+        sys.exit(1)
+
+    store = UserStore(sys.argv[3])
+    if sys.argv[1] == "import":
+        print(f"Imported {store.import_json(sys.argv[2])} users")
+    else:
+        store.export_json(sys.argv[2])
+        print(f"Exported {len(store)} users")
@@ -0,0 +1,85 @@
+import hashlib
+import threading
+import time
+
+# Per-table change versions for conditional GETs. Write handlers bump a
+# table's version after committing; the list endpoints derive ETag and
+# Last-Modified from it, so an unchanged poll is answered with 304 before any
+# SQL runs.
+#
+# In-process versions can't see writes made by other workers, so validators
+# also roll over every ttl seconds, bounding staleness like the response
+# cache TTL does. With a Redis URL all workers share one set of versions.
+
+
+class TableVersions:
+    # The Redis form of bump(): one atomic script, so concurrent workers
+    # also move Last-Modified forward by at least a second per bump
+    BUMP_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    for i = 2, #ARGV do
+        redis.call("HINCRBY", KEYS[1], ARGV[i], 1)
+        local previous = tonumber(redis.call("HGET", KEYS[1], ARGV[i] .. ":modified"))
+        local modified = now
+        if previous and previous + 1 > now then
+            modified = previous + 1
+        end
+        redis.call("HSET", KEYS[1], ARGV[i] .. ":modified", modified)
+    end
+    """
+
+    def __init__(self, ttl=60, redis_url=None, key="table_versions"):
+        self.ttl = ttl
+        self._key = key
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+            self._bump_script = self._redis.register_script(self.BUMP_SCRIPT)
+        self._started_at = float(int(time.time()))
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _next_modified(previous):
+        # Last-Modified has one-second resolution: every bump moves it to a
+        # later whole second, or a write within the same second as a client's
+        # read would be hidden behind If-Modified-Since
+        return max(float(int(time.time())), float(int(previous)) + 1)
+
+    def bump(self, *tables):
+        if self._redis is not None:
+            self._bump_script(keys=[self._key], args=[int(time.time()), *tables])
+            return
+        with self._lock:
+            for table in tables:
+                version, modified = self._versions.get(table, (0, self._started_at))
+                self._versions[table] = (version + 1, self._next_modified(modified))
+
+    def current(self, table):
+        # -> (version token, last modified timestamp)
+        if self._redis is not None:
+            version, modified = self._redis.hmget(self._key, table, table + ":modified")
+            if version is None:
+                return "0", self._started_at
+            return version.decode("ascii"), float(modified)
+
+        with self._lock:
+            version, modified = self._versions.get(table, (0, self._started_at))
+        if not self.ttl:
+            return str(version), modified
+        epoch = int(time.time() // self.ttl)
+        return f"{version}.{epoch}", max(modified, float(epoch * self.ttl))
+
+    def last_modified(self, table):
+        # Time of the last bump, without the ttl rollover
+        if self._redis is not None:
+            modified = self._redis.hget(self._key, table + ":modified")
+            return 0.0 if modified is None else float(modified)
+        with self._lock:
+            return self._versions.get(table, (0, 0.0))[1]
+
+    def etag(self, table, version, key):
+        return hashlib.sha1(f"{table}:{version}:{key}".encode("utf-8")).hexdigest()
+